@@ -1,30 +1,51 @@
 #!/usr/bin/env python3
+import atexit
 import os
-import subprocess
 import sys
 import time
-import json
-from pathlib import Path
 from datetime import datetime
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
+import lib.battery as battery
 import lib.graphic as gr
+import lib.helper as helper
+import lib.idle as idle
 import lib.input as input
+import lib.jobs as jobs
+import lib.meminfo as meminfo
+import lib.netinfo as netinfo
+import lib.perf as perf
+import lib.scheduler as scheduler
+import lib.services as services
+import lib.startup as startup
+import lib.trace as trace
+import lib.widgets as widgets
+from lib.widgets import button_circle
 
 current_window = "main"
-selected_position = 0
-scroll_offset = 0  # Track scroll position
-visible_items = 7  # Number of items visible at once
-menu_len = 11
+menu_list = None  # widgets.VirtualList del menú principal
+full_redraw = True  # False si desde el último frame solo cambió la selección
 app_name = "SystemApps"
+last_status = None
+message = ("", 80, True)
+current_job = None
 script_dir = os.path.join(current_dir, "scripts")
+# Scripts que el proceso auxiliar sabe hacer sin lanzar bash
+helper_actions = {
+    "EnableSSH.sh": "enable_ssh",
+    "DisableSSH.sh": "disable_ssh",
+    "EnableSCP.sh": "enable_scp",
+    "DisableSCP.sh": "disable_scp",
+    "CleanRAM.sh": "drop_caches",
+    "SyncTime.sh": "sync_time",
+}
 
 def get_options():
-    ssh_status = check_service_status("ssh")
-    scp_status = check_service_status("scp")
+    with perf.span("probe"):
+        ssh_status, scp_status = services.status()
     options = []
     
     options.append(("Disable SSH" if ssh_status else "Enable SSH", "ssh"))
@@ -42,23 +63,16 @@ def get_options():
     return options, ssh_status, scp_status
 
 def get_battery_percentage():
-    try:
-        with open('/sys/class/power_supply/axp2202-battery/capacity', 'r') as f:
-            return f"{f.read().strip()}%"
-    except:
-        return "N/A"
+    capacity = battery.start().read("capacity")
+    return "N/A" if capacity is None else f"{capacity}%"
 
 def get_battery_info():
     try:
+        sampler = battery.start()
         info = {}
-        files = ['status', 'capacity', 'voltage_now', 'current_now', 'health']
-        
-        for file in files:
-            try:
-                with open(f'/sys/class/power_supply/axp2202-battery/{file}', 'r') as f:
-                    info[file] = f.read().strip()
-            except:
-                info[file] = 'N/A'
+        for file in battery.attributes:
+            value = sampler.read(file)
+            info[file] = 'N/A' if value is None else value
         
         voltage = 'N/A' if info['voltage_now'] == 'N/A' else f"{int(info['voltage_now'])/1000000:.2f}V"
         current = 'N/A' if info['current_now'] == 'N/A' else f"{int(info['current_now'])/1000000:.2f}A"
@@ -72,163 +86,263 @@ def get_battery_info():
         return f"Battery information not available"
 
 def get_local_ip():
-    try:
-        result = subprocess.run(['hostname', '-I'], capture_output=True, text=True)
-        return result.stdout.strip().split()[0]
-    except:
-        return "IP not available"
+    return netinfo.local_ip() or "IP not available"
 
 def get_ram_info():
     """Get RAM usage information"""
-    try:
-        script_path = os.path.join(script_dir, "GetRAM.sh")
-        subprocess.run(['bash', script_path], check=True)
-        
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "log.txt"), 'r') as f:
-            ram_info = json.loads(f.read().strip())
-        return ram_info
-    except Exception as e:
-        print(f"Error getting RAM info: {e}")
-        return {"total": 0, "used": 0, "available": 0, "usage_percent": 0}
+    return meminfo.sample()
     
-def show_ram_status():
-    """Shows RAM status in a message box"""
-    ram_info = get_ram_info()
+def draw_ram_screen():
+    """Pantalla de RAM: última lectura y tendencia; se redibuja con cada muestra"""
+    ram_info = meminfo.samples[-1][1] if meminfo.samples else get_ram_info()
     ram_text = f"RAM Usage: {ram_info['usage_percent']}%\nUsed: {ram_info['used']}MB / {ram_info['total']}MB\nAvailable: {ram_info['available']}MB"
     gr.draw_clear()
     gr.draw_log(ram_text, fill=gr.colorBlue, outline=gr.colorBlueD1, height=120, centered=False)
+    gr.draw_text((320, 320), "RAM Usage Trend", font=13, anchor="mm")
+    gr.draw_graph(meminfo.usage_history(), [70, 335, 570, 435], color="white", fill=gr.colorGrayD2, outline=gr.colorBlueD1)
     gr.draw_paint()
-    time.sleep(3)
-    return
 
 def check_scp_config():
     """Verifica si la configuración actual tiene SCP habilitado"""
-    try:
-        with open('/etc/ssh/sshd_config', 'r') as f:
-            config = f.read()
-            return 'AllowTcpForwarding yes' in config
-    except:
-        return False
+    return services.scp_configured()
 
 def check_service_status(service_type):
     """Verifica el estado de los servicios"""
     if service_type == "ssh":
-        try:
-            result = subprocess.run(['systemctl', 'is-active', 'ssh'], 
-                                capture_output=True, text=True)
-            return result.stdout.strip() == 'active'
-        except:
-            return False
+        return services.ssh_active()
     else:  # scp
-        return check_service_status("ssh") and check_scp_config()
+        return services.scp_active()
 
-def row_list(text, pos, width, selected):
-    gr.draw_rectangle_r(
-        [pos[0], pos[1], pos[0] + width, pos[1] + 32],
-        5,
-        fill=(gr.colorBlue if selected else gr.colorGrayL1),
-    )
-    gr.draw_text((pos[0] + 5, pos[1] + 5), text)
 
-def button_circle(pos, button, text):
-    gr.draw_circle(pos, 25, fill=gr.colorBlueD1)
-    gr.draw_text((pos[0] + 12, pos[1] + 12), button, anchor="mm")
-    gr.draw_text((pos[0] + 30, pos[1] + 12), text, font=13, anchor="lm")
+def format_hours(hours):
+    return f"{int(hours)}h {int(hours * 60) % 60:02d}m"
 
+def draw_battery_screen():
+    """Pantalla de batería: nivel, tasa de descarga e historial"""
+    sampler = battery.start()
+    rate = sampler.discharge_rate()
+    remaining = sampler.time_to_empty()
+    _, capacity = sampler.history()
 
-def show_message(msg='Processing...', colorFill=gr.colorBlue):
-    """Muestra el mensaje de procesamiento"""
     gr.draw_clear()
-    gr.draw_log(msg, fill=colorFill, outline=gr.colorBlueD1)
+    widgets.container("Battery")
+    gr.draw_text((320, 60), f"Battery Level: {get_battery_percentage()}", anchor="mm")
+    gr.draw_text((320, 85), "Rate: " + ("N/A" if rate is None else f"{rate:+.1f}%/h"), font=13, anchor="mm")
+    gr.draw_text((320, 105), "Time to empty: " + ("N/A" if remaining is None else format_hours(remaining)), font=13, anchor="mm")
+    gr.draw_graph(capacity, [30, 130, 610, 410], color="white", fill=gr.colorGrayL1, outline=gr.colorBlueD1)
+    button_circle((133, 440), "B", "Back")
     gr.draw_paint()
 
+def show_window(window, text=None, height=80, centered=True):
+    """Abre una pantalla que vuelve al menú al pulsar una tecla"""
+    global current_window, message
+    current_window = window
+    message = (text, height, centered)
+    invalidate()
+
+def invalidate():
+    """Marca la pantalla para redibujarla entera"""
+    global full_redraw
+    full_redraw = True
+    scheduler.mark_dirty()
+
+def draw_message():
+    text, height, centered = message
+    gr.draw_clear()
+    gr.draw_log(text, fill=gr.colorBlue, outline=gr.colorBlueD1, height=height, centered=centered)
+    gr.draw_paint()
+
+def on_job_update():
+    """Llamado desde el hilo del Job con cada línea y al terminar"""
+    if current_job is not None and not current_job.running:
+        services.invalidate()
+    invalidate()
+    scheduler.wake()
+
 def execute_script(script_path):
-    try:
-        show_message('Processing...')
-        subprocess.run(['bash', script_path], check=True)
-        show_message('Success!', gr.colorGreen)
-        time.sleep(1)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing script: {e}")
-        return False
+    """
+    Lanza el script en segundo plano y muestra su salida en vivo. Si el
+    auxiliar tiene una acción equivalente se le pide a él y el script solo
+    se usa cuando no responde.
+    """
+    global current_job
+    name = os.path.basename(script_path)
+    action = helper_actions.get(name)
+    job = None
+    if action:
+        for attempt in range(2):
+            try:
+                job = jobs.run_action(os.path.splitext(name)[0], action, on_update=on_job_update)
+                break
+            except OSError as e:
+                # Un reintento con el auxiliar relanzado antes de recurrir al script
+                if attempt or not helper.restart():
+                    print(f"Helper not available, running {name}: {e}")
+                    break
+    current_job = job or jobs.run_script(script_path, on_update=on_job_update)
+    show_window("job")
+    return current_job
+
+def draw_job_screen():
+    job = current_job
+    gr.draw_clear()
+    widgets.container(job.title)
+
+    elapsed = int(job.elapsed())
+    status_color = gr.colorGreen if job.succeeded else (gr.colorBlue if job.running else gr.colorBlueD1)
+    widgets.rounded_rectangle([20, 50, 620, 82], 5, fill=status_color)
+    gr.draw_text((30, 66), job.status_text(), anchor="lm")
+    gr.draw_text((610, 66), f"{elapsed // 60:02d}:{elapsed % 60:02d}", anchor="rm")
+
+    # Últimas líneas de la salida
+    line_height = 20
+    max_chars = 72
+    for i, line in enumerate(job.tail(16)):
+        gr.draw_text((25, 92 + i * line_height), line[:max_chars], font=13)
+
+    if job.running:
+        button_circle((133, 440), "B", "Cancel")
+    else:
+        button_circle((133, 440), "B", "Back")
+    gr.draw_paint()
+
+def refresh_status():
+    """Tarea periódica: redibuja solo si cambió el estado de SSH/SCP"""
+    global last_status
+    status = services.status()
+    if status != last_status:
+        last_status = status
+        invalidate()
+
+def on_network_change():
+    """Llamado desde el poll cuando rtnetlink avisa de un cambio"""
+    if netinfo.handle_events() and current_window == "main":
+        invalidate()
+
+def on_ram_sample():
+    meminfo.sample()
+    if current_window == "ram":
+        invalidate()
+
+def on_battery_sample():
+    if current_window == "battery":
+        invalidate()
+        scheduler.wake()
+
+def on_idle():
+    battery.start().pause()
+
+def on_active():
+    battery.start().resume()
+    invalidate()
 
 def start():
     print(f"Starting {app_name}...")
+    if os.environ.get("SYSTEMAPPS_TRACE"):
+        trace.record(os.environ["SYSTEMAPPS_TRACE"])
+    # El reloj avanza al comienzo de cada segundo
+    scheduler.add_task("clock", 1.0, invalidate, delay=1 - time.time() % 1)
+    scheduler.add_task("status", 2.0, refresh_status)
+    scheduler.add_task("ram", 5.0, on_ram_sample, delay=0)
+    battery.start(on_sample=on_battery_sample)
+    # En reposo no se muestrea la batería; un script en marcha lo impide
+    idle.on_idle.append(on_idle)
+    idle.on_active.append(on_active)
+    idle.inhibit = lambda: current_job is not None and current_job.running
+    netlink_fd = netinfo.watch()
+    if netlink_fd is not None:
+        scheduler.add_reader(netlink_fd, on_network_change)
+    fake_root = os.environ.get("SYSTEMAPPS_HELPER_FAKE")
+    if fake_root:
+        # La aplicación lee el estado de los mismos ficheros que simula el auxiliar
+        helper.fake_paths(fake_root)
+    if helper.start(fake_root):
+        atexit.register(helper.stop)
+    gr.init()
     load_main_menu()
+    startup.first_frame()
 
 def update():
-    global current_window, selected_position
+    scheduler.run_once(handle_input, draw)
+
+def draw():
+    if current_window == "battery":
+        draw_battery_screen()
+    elif current_window == "ram":
+        draw_ram_screen()
+    elif current_window == "message":
+        draw_message()
+    elif current_window == "job":
+        draw_job_screen()
+    elif full_redraw:
+        load_main_menu()
+    else:
+        # Solo se movió la selección: se pintan las filas afectadas
+        gr.draw_update()
+        menu_list.paint()
+        gr.draw_paint()
 
-    input.check()
+def handle_input():
+    global current_window
 
     if input.key("MENUF"):
         gr.draw_end()
         print(f"Starting {app_name}...")
         sys.exit()
 
-    load_main_menu()
+    if perf.handle_input():
+        pass
+    elif current_window == "job":
+        if current_job.running:
+            if input.key("B"):
+                current_job.cancel()
+        elif input.key("A") or input.key("B"):
+            current_window = "main"
+    elif current_window != "main":
+        # Cualquier tecla vuelve al menú
+        current_window = "main"
+    elif input.key("DY"):
+        move_cursor_dy(False)
+        scheduler.mark_dirty()
+        return
+    elif input.key("A"):
+        options, _, _ = get_options()
+        service_type = options[menu_list.selected][1]
+        toggle_service(service_type)
+
+    invalidate()
 
 def move_cursor_dy(auto_move: bool = False):
-    global selected_position, scroll_offset
-    
     if auto_move or input.value == 1:  # Moving down
-        if selected_position < menu_len - 1:
-            selected_position += 1
-            if selected_position - scroll_offset >= visible_items:
-                scroll_offset += 1
-        else:
-            selected_position = 0
-            scroll_offset = 0
+        menu_list.move(1, wrap=True)
     elif input.value == -1:  # Moving up
-        if selected_position == 0:
-            selected_position = menu_len - 1
-            scroll_offset = max(0, menu_len - visible_items)
-        else:
-            selected_position -= 1
-            if selected_position < scroll_offset:
-                scroll_offset -= 1
+        menu_list.move(-1, wrap=True)
 
 def auto_move_cursor():
     move_cursor_dy(True)
 
 def load_main_menu():
+    global menu_list, full_redraw
     options, ssh_status, scp_status = get_options()
-    
-    if input.key("DY"):
-        move_cursor_dy(False)
-    elif input.key("A"):
-        service_type = options[selected_position][1]
-        toggle_service(service_type)
+    if menu_list is None:
+        menu_list = widgets.VirtualList((20, 130), 600, 280)
+    menu_list.set_items(text for text, _ in options)
+    full_redraw = False
 
     gr.draw_clear()
 
     # Draw main container
-    gr.draw_rectangle_r([10, 40, 630, 440], 15, fill=gr.colorGrayD2, outline=None)
-    gr.draw_text((320, 20), app_name, anchor="mm")
+    widgets.container(app_name)
 
     # Draw status
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     gr.draw_text((320, 60), "SSH Status: " + ("Active" if ssh_status else "Inactive"), anchor="mm")
     gr.draw_text((320, 80), "SCP Status: " + ("Active" if scp_status else "Inactive"), anchor="mm")
     gr.draw_text((320, 100), f"Current Time: {current_time}", anchor="mm")
-
-    # Calculate visible range
-    start_idx = scroll_offset
-    end_idx = min(start_idx + visible_items, len(options))
-
-    # Draw scroll indicators if needed
-    if scroll_offset > 0:
-        gr.draw_text((320, 120), "▲", anchor="mm")  # Up arrow
-    if end_idx < len(options):
-        gr.draw_text((320, 410), "▼", anchor="mm")  # Down arrow
+    gr.draw_text((620, 20), get_local_ip(), font=13, anchor="rm")
 
     # Draw visible options
-    for i in range(start_idx, end_idx):
-        relative_pos = i - start_idx  # Position relative to visible window
-        y_pos = 130 + (relative_pos * 40)  # 40 pixels between items
-        text, _ = options[i]
-        row_list(text, (20, y_pos), 600, i == selected_position)
+    menu_list.draw()
 
     # Draw buttons
     button_circle((133, 440), "F", "Exit")
@@ -256,30 +370,20 @@ def toggle_service(service_type):
         else:
             script = os.path.join(script_dir, "EnableSCP.sh")
     elif service_type == "battery":
-        percentage = get_battery_percentage()
-        gr.draw_clear()
-        gr.draw_log(f"Battery Level: {percentage}", fill=gr.colorBlue, outline=gr.colorBlueD1)
-        gr.draw_paint()
-        time.sleep(3)
+        show_window("battery")
         return
     elif service_type == "battery_info":
-        battery_info = get_battery_info()
-        gr.draw_clear()
-        gr.draw_log(battery_info, fill=gr.colorBlue, outline=gr.colorBlueD1, height=150, centered=False)
-        gr.draw_paint()
-        time.sleep(5)
+        show_window("message", get_battery_info(), height=150, centered=False)
         return
     elif service_type == "ip":
-        local_ip = get_local_ip()
-        gr.draw_clear()
-        gr.draw_log(f"Local IP: {local_ip}", fill=gr.colorBlue, outline=gr.colorBlueD1)
-        gr.draw_paint()
-        time.sleep(3)
+        text = netinfo.describe()
+        show_window("message", text, height=max(80, 25 * text.count("\n") + 55), centered=False)
         return
     elif service_type == "sync":
         script = os.path.join(script_dir, "SyncTime.sh")
     elif service_type == "ram":
-        show_ram_status()
+        get_ram_info()
+        show_window("ram")
         return
     elif service_type == "clean_ram":
         script = os.path.join(script_dir, "CleanRAM.sh")
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de los caminos críticos sin la consola.
+
+El framebuffer es un fichero normal, la entrada un FIFO por el que se
+escriben eventos evdev, y el pidfile de sshd, /proc y el sysfs de la
+batería apuntan a un directorio temporal. Cada escenario usa el código
+real (app, ManualReader) y se mide dos veces: una con tiempos y bytes
+escritos al framebuffer y otra con tracemalloc para las asignaciones.
+
+    python3 benchmark.py -o baseline.json
+    python3 benchmark.py --compare baseline.json
+    python3 benchmark.py --replay sesion.trace --speed 4
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import lib.battery as battery
+import lib.graphic as gr
+import lib.idle as idle
+import lib.input as input
+import lib.scheduler as scheduler
+import lib.services as services
+import lib.trace as trace
+import lib.widgets as widgets
+
+codes = {name: code for code, name in input.mapping.items()}
+
+
+class Environment:
+    """Rutas falsas para framebuffer, entrada, servicios y batería"""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix="systemapps-bench-")
+        self.manuals = os.path.join(self.root, "manuals")
+        shutil.copytree(os.path.join(current_dir, "manuals"), self.manuals)
+        self._write_long_manual()
+        import lib.manual_reader_main as manual_reader_main
+        manual_reader_main.manuals_root = self.manuals
+
+        gr.fb_path = os.path.join(self.root, "fb0")
+        with open(gr.fb_path, "wb") as f:
+            f.truncate(gr.screen_size)
+
+        fifo = os.path.join(self.root, "event1")
+        os.mkfifo(fifo)
+        input.devices = [fifo]
+        input.open_devices()
+        self.writer = os.open(fifo, os.O_WRONLY)
+
+        proc = os.path.join(self.root, "proc")
+        os.makedirs(proc)
+        services.pid_file = os.path.join(self.root, "sshd.pid")
+        services.config_file = os.path.join(self.root, "sshd_config")
+        services.proc_root = proc
+        with open(services.config_file, "w") as f:
+            f.write("PermitRootLogin yes\n")
+
+        battery.sysfs_root = os.path.join(self.root, "battery")
+        os.makedirs(battery.sysfs_root)
+        for name, value in (("capacity", "80"), ("status", "Discharging"), ("voltage_now", "3900000"),
+                            ("current_now", "500000"), ("health", "Good")):
+            with open(os.path.join(battery.sysfs_root, name), "w") as f:
+                f.write(value + "\n")
+
+        scheduler.frame_budget = 0  # medir la latencia, no el ritmo de frames
+        idle.timeout = 0  # sin reposo aunque una traza tenga pausas largas
+        gr.init()
+
+    def _write_long_manual(self):
+        steps = {f"Step {i}": "Hold the button and move the stick to the next position. " * 4 for i in range(1, 101)}
+        with open(os.path.join(self.manuals, "long_manual.json"), "w", encoding="utf-8") as f:
+            json.dump({"Long section": steps}, f, indent=4)
+
+    def press(self, name, value=1):
+        """Escribe una pulsación y su liberación en el FIFO de entrada"""
+        etype = input.EV_ABS if name in ("DX", "DY") else input.EV_KEY
+        now = time.time()
+        sec, usec = int(now), int(now % 1 * 1e6)
+        data = struct.pack(input.EVENT_FORMAT, sec, usec, etype, codes[name], value)
+        data += struct.pack(input.EVENT_FORMAT, sec, usec, etype, codes[name], 0)
+        os.write(self.writer, data)
+
+    def close(self):
+        os.close(self.writer)
+        gr.draw_end()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# Escenarios: cada uno prepara el estado y devuelve una lista de (preparar, paso);
+# solo se mide paso, que corresponde a un frame
+
+def scenario_main_menu(env, frames):
+    import app
+    app.load_main_menu()
+
+    def frame():
+        app.invalidate()
+        app.draw()
+    return [(None, frame)] * frames
+
+
+def scenario_menu_scroll(env, frames):
+    import app
+    app.current_window = "main"
+    app.load_main_menu()
+    app.menu_list.select(0)
+
+    def step():
+        env.press("DY", 1)
+        app.update()
+    # Dos vueltas completas al menú, con el salto del último al primero
+    return [(None, step)] * (len(app.menu_list) * 2)
+
+
+def _reader(env):
+    from lib.manual_reader import ManualReader
+    reader = ManualReader(env.manuals)
+    reader.draw_menu()
+    return reader
+
+
+def _select(reader, name):
+    for i, item in enumerate(reader.current_items):
+        if item["name"] == name:
+            reader.list.select(i)
+            return
+    raise KeyError(name)
+
+
+def scenario_open_manual(env, frames):
+    reader = _reader(env)
+    _select(reader, "joysticks")
+    env.press("A")
+    reader.update()
+
+    def back():
+        if reader.in_manual:
+            env.press("B")
+            reader.update()
+        _select(reader, "gamesir_t4pro")
+
+    def open_manual():
+        env.press("A")
+        reader.update()
+    return [(back, open_manual)] * frames
+
+
+def scenario_section_scroll(env, frames):
+    reader = _reader(env)
+    _select(reader, "long_manual")
+    env.press("A")
+    reader.update()
+    env.press("A")  # abrir "Long section"
+    reader.update()
+    steps = reader.get_max_scroll() // gr.scroll_line_height
+
+    def step():
+        env.press("DY", 1)
+        reader.update()
+    return [(None, step)] * steps
+
+
+scenarios = {
+    "main_menu_frame": scenario_main_menu,
+    "main_menu_scroll": scenario_menu_scroll,
+    "manual_open": scenario_open_manual,
+    "section_scroll": scenario_section_scroll,
+}
+
+
+def run_replay(env, path, speed):
+    """Reproduce una traza grabada con SYSTEMAPPS_TRACE sobre el menú principal"""
+    import app
+    app.current_window = "main"
+    app.load_main_menu()
+    written = gr.bytes_flushed_total
+    frames = gr.frames_painted
+    start = time.perf_counter()
+    result = trace.replay(path, app.update, speed)
+    result["speed"] = speed
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["frames"] = gr.frames_painted - frames
+    result["fb_bytes_total"] = gr.bytes_flushed_total - written
+    gr.init()  # MENUF cerró el framebuffer
+    return result
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    # Rango más cercano: el menor valor con al menos p% de muestras por debajo
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(env, factory, frames):
+    steps = factory(env, frames)
+    times = []
+    written = []
+    copies = []  # copias de datos de píxel (ver gr.copies)
+    for prepare, step in steps:
+        if prepare:
+            prepare()
+        bytes_before = gr.bytes_flushed_total
+        copies_before = gr.copies_total
+        start = time.perf_counter()
+        step()
+        times.append((time.perf_counter() - start) * 1000)
+        written.append(gr.bytes_flushed_total - bytes_before)
+        copies.append(gr.copies_total - copies_before)
+
+    steps = factory(env, frames)
+    peaks = []
+    tracemalloc.start()
+    for prepare, step in steps:
+        if prepare:
+            prepare()
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        step()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - current)
+    tracemalloc.stop()
+
+    return {
+        "frames": len(times),
+        "p50_ms": round(percentile(times, 50), 3),
+        "p95_ms": round(percentile(times, 95), 3),
+        "p99_ms": round(percentile(times, 99), 3),
+        "mean_ms": round(sum(times) / len(times), 3) if times else 0,
+        "max_ms": round(max(times), 3) if times else 0,
+        "fb_bytes_per_frame": sum(written) // len(written) if written else 0,
+        "fb_bytes_total": sum(written),
+        "copies_per_frame": round(sum(copies) / len(copies), 2) if copies else 0,
+        "alloc_peak_p50_bytes": int(percentile(peaks, 50)),
+        "alloc_peak_max_bytes": max(peaks) if peaks else 0,
+    }
+
+
+def compare(results, baseline):
+    print(f"{'scenario':<18} {'metric':<22} {'baseline':>12} {'now':>12} {'change':>8}")
+    rows = [(name, metrics, baseline.get("scenarios", {}).get(name)) for name, metrics in results["scenarios"].items()]
+    if "replay" in results:
+        rows.append(("replay", results["replay"], baseline.get("replay")))
+    for name, metrics, old in rows:
+        if not old:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "fb_bytes_per_frame", "alloc_peak_p50_bytes"):
+            if metric not in metrics:
+                continue
+            before = old.get(metric)
+            now = metrics[metric]
+            change = f"{(now - before) / before * 100:+.0f}%" if before else "-"
+            print(f"{name:<18} {metric:<22} {before!s:>12} {now!s:>12} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the render and input paths")
+    parser.add_argument("-o", "--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--frames", type=int, default=100, help="frames for the fixed-length scenarios")
+    parser.add_argument("--scenario", action="append", choices=sorted(scenarios), help="run only these scenarios")
+    parser.add_argument("--replay", help="input trace to replay; reports input-to-paint latency")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor (0: no waiting)")
+    parser.add_argument("--render-mode", default="buffer", choices=("buffer", "direct"))
+    parser.add_argument("--font", help="TTF font to use instead of " + gr.font_path)
+    args = parser.parse_args()
+
+    gr.render_mode = args.render_mode
+    if args.font:
+        gr.font_path = args.font
+
+    env = Environment()
+    try:
+        results = {
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "render_mode": gr.render_mode,
+                "frames": args.frames,
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            },
+            "scenarios": {},
+        }
+        if args.replay:
+            results["replay"] = run_replay(env, args.replay, args.speed)
+        if args.scenario or not args.replay:
+            for name in args.scenario or scenarios:
+                results["scenarios"][name] = measure(env, scenarios[name], args.frames)
+        # Aciertos acumulados de las cachés de render en todos los escenarios
+        results["caches"] = {"text": gr.text_cache_stats(), "sprites": widgets.sprite_cache_stats()}
+    finally:
+        env.close()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
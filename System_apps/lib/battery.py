@@ -0,0 +1,154 @@
+"""
+Telemetría de batería en segundo plano.
+
+Un hilo mantiene abiertos los atributos de sysfs de la batería y los
+vuelve a leer con os.pread cada pocos segundos. Capacidad, voltaje y
+corriente se guardan en buffers circulares respaldados por array, de los
+que se calcula la tasa de descarga y el tiempo restante estimado.
+"""
+import os
+import threading
+import time
+from array import array
+
+sysfs_root = "/sys/class/power_supply/axp2202-battery"
+attributes = ("status", "capacity", "voltage_now", "current_now", "health")
+
+
+class RingBuffer:
+    """Buffer circular de tamaño fijo sobre un array tipado"""
+
+    def __init__(self, typecode, size):
+        self.size = size
+        self.data = array(typecode, [0] * size)
+        self.count = 0
+        self.index = 0
+
+    def append(self, item):
+        self.data[self.index] = item
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def values(self):
+        """Valores del más antiguo al más reciente"""
+        if self.count < self.size:
+            return self.data[:self.count].tolist()
+        return (self.data[self.index:] + self.data[:self.index]).tolist()
+
+    def __len__(self):
+        return self.count
+
+
+class BatterySampler(threading.Thread):
+    def __init__(self, root=None, interval=10.0, size=360, on_sample=None):
+        super().__init__(name="battery-sampler", daemon=True)
+        self.root = root or sysfs_root
+        self.interval = interval
+        self.on_sample = on_sample
+        self.times = RingBuffer("d", size)
+        self.capacity = RingBuffer("h", size)
+        self.voltage = RingBuffer("l", size)  # µV
+        self.current = RingBuffer("l", size)  # µA
+        self._fds = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._resume = threading.Event()
+        self._resume.set()
+        self._open()
+
+    def _open(self):
+        for name in attributes:
+            try:
+                self._fds[name] = os.open(os.path.join(self.root, name), os.O_RDONLY)
+            except OSError:
+                pass
+
+    def close(self):
+        self._stopping.set()
+        self._resume.set()
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+
+    def read(self, name):
+        """Lee un atributo sin reabrir el fichero; None si no está disponible"""
+        fd = self._fds.get(name)
+        if fd is None:
+            return None
+        try:
+            return os.pread(fd, 64, 0).decode().strip()
+        except (OSError, ValueError):
+            return None
+
+    def read_int(self, name):
+        raw = self.read(name)
+        try:
+            return int(raw)
+        except (TypeError, ValueError):
+            return None
+
+    def sample(self):
+        capacity = self.read_int("capacity")
+        if capacity is None:
+            return
+        with self._lock:
+            self.times.append(time.monotonic())  # inmune a cambios de hora (sync_time, NTP)
+            self.capacity.append(capacity)
+            self.voltage.append(self.read_int("voltage_now") or 0)
+            self.current.append(self.read_int("current_now") or 0)
+        if self.on_sample:
+            self.on_sample()
+
+    def history(self):
+        """Devuelve (tiempos de time.monotonic, capacidades) del buffer"""
+        with self._lock:
+            return self.times.values(), self.capacity.values()
+
+    def discharge_rate(self):
+        """Pendiente de la capacidad en %/hora (negativa al descargar), o None"""
+        times, capacity = self.history()
+        if len(times) < 2 or times[-1] - times[0] < 60:
+            return None
+        # Regresión lineal por mínimos cuadrados
+        n = len(times)
+        mean_t = sum(times) / n
+        mean_c = sum(capacity) / n
+        num = sum((t - mean_t) * (c - mean_c) for t, c in zip(times, capacity))
+        den = sum((t - mean_t) ** 2 for t in times)
+        if not den:
+            return None
+        return num / den * 3600
+
+    def time_to_empty(self):
+        """Horas estimadas hasta vaciarse, o None si no se está descargando"""
+        rate = self.discharge_rate()
+        capacity = self.read_int("capacity")
+        if rate is None or rate >= 0 or capacity is None:
+            return None
+        return capacity / -rate
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    def run(self):
+        while not self._stopping.is_set():
+            self._resume.wait()
+            if self._stopping.is_set():
+                break
+            self.sample()
+            self._stopping.wait(self.interval)
+
+
+sampler = None
+
+
+def start(root=None, interval=10.0, size=360, on_sample=None):
+    """Arranca el muestreador global (una sola vez)"""
+    global sampler
+    if sampler is None:
+        sampler = BatterySampler(root, interval, size, on_sample)
+        sampler.start()
+    return sampler
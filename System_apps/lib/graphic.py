@@ -1,8 +1,14 @@
+from collections import OrderedDict
 from fcntl import ioctl
-from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+import io
 import mmap
 import os
+import struct
+import time
 
+fb_path = "/dev/fb0"  # un fichero normal sirve para pruebas sin pantalla
 fb: int
 mm: mmap.mmap
 screen_width = 640
@@ -10,86 +16,657 @@ screen_height = 480
 bytes_per_pixel = 4
 screen_size = screen_width * screen_height * bytes_per_pixel
 
-fontFile = {}
-fontFile[15] = ImageFont.truetype("/usr/share/fonts/TTF/DejaVuSansMono.ttf", 15)
-fontFile[13] = ImageFont.truetype("/usr/share/fonts/TTF/DejaVuSansMono.ttf", 13)
-fontFile[11] = ImageFont.truetype("/usr/share/fonts/TTF/DejaVuSansMono.ttf", 11)
-colorBlue = "#bb7200"
-colorBlueD1 = "#7f4f00"
+# "flip": se dibuja en la página oculta del framebuffer (altura virtual doble)
+# y draw_paint la muestra con FBIOPAN_DISPLAY; "buffer": se dibuja en un
+# buffer reutilizable y draw_paint copia las filas cambiadas; "direct": se
+# dibuja sobre la página visible. Si el driver no permite "flip" se usa "buffer"
+render_mode = "flip"
+wait_vsync = True  # esperar a FBIO_WAITFORVSYNC antes de cambiar de página
+
+FBIOGET_VSCREENINFO = 0x4600
+FBIOPUT_VSCREENINFO = 0x4601
+FBIOGET_FSCREENINFO = 0x4602
+FBIOPAN_DISPLAY = 0x4606
+FBIOBLANK = 0x4611
+FB_BLANK_UNBLANK = 0
+FB_BLANK_NORMAL = 1
+FB_BLANK_POWERDOWN = 4
+FBIO_WAITFORVSYNC = 0x40044620
+VSCREENINFO_FORMAT = "8I12I16I4I"  # struct fb_var_screeninfo (160 bytes)
+FSCREENINFO_FORMAT = "16sLIIIIHHHILIIHHH"  # struct fb_fix_screeninfo
+
+pages = 1  # páginas disponibles en el framebuffer virtual
+line_length = screen_width * bytes_per_pixel  # bytes por fila en /dev/fb0
+_vscreeninfo = None  # campos de fb_var_screeninfo para FBIOPAN_DISPLAY
+_front = 0  # página visible
+_scanout = 0  # desplazamiento en bytes de la página visible, donde copia el modo "buffer"
+_page_images = []
+_page_ink = []  # bbox dibujado en cada página
+_last_spans = []  # filas dañadas en el último frame mostrado
+_back_synced = False  # la página oculta solo difiere de la visible en _last_spans
+_frame_synced = False  # el frame en curso partió de una copia de la página visible
+# Byte de cada canal (R, G, B, A) dentro de un píxel del framebuffer. El
+# valor por defecto es el BGRA que programa screen_reset()
+pixel_order = (2, 1, 0, 3)
+
+font_path = "/usr/share/fonts/TTF/DejaVuSansMono.ttf"
+_font_data = None
+
+
+class _FontCache(dict):
+    """fontFile[size]: carga cada tamaño la primera vez que se usa"""
+
+    def __missing__(self, size):
+        global _font_data
+        if _font_data is None:
+            # El fichero se lee una sola vez para todos los tamaños
+            with open(font_path, "rb") as f:
+                _font_data = f.read()
+        font = ImageFont.truetype(io.BytesIO(_font_data), size)
+        self[size] = font
+        return font
+
+
+fontFile = _FontCache()
+# Colores en RGB real; native_color() los pasa al formato del framebuffer
+colorBlue = "#0072bb"
+colorBlueD1 = "#004f7f"
 colorGray = "#292929"
 colorGrayL1 = "#383838"
 colorGrayD2 = "#141414"
-colorGreen = "#008f39"
+colorGreen = "#398f00"
 
 activeImage: Image.Image
 activeDraw: ImageDraw.ImageDraw
+_initialized = False
+
+# Dirty rectangles: regiones (x0, y0, x1, y1) tocadas desde el último draw_paint
+damage = []
+_ink = None  # bbox de todo lo dibujado desde el último draw_clear
+_shadow = bytearray(screen_size)  # copia de lo que hay ahora en /dev/fb0
+_full_flush = True  # el contenido inicial del framebuffer es desconocido
+
+# Contadores de bytes escritos al framebuffer
+bytes_flushed = 0
+bytes_flushed_total = 0
+frames_painted = 0
+copies = 0  # copias de datos de píxel en el último draw_paint
+copies_total = 0
+paint_time = 0.0  # segundos que tardó el último draw_paint
+overlay = None  # función que dibuja encima de cada frame justo antes de mostrarlo
+after_paint = None  # función llamada cuando el frame ya está en pantalla
+
+# Caché LRU de textos ya rasterizados: (texto, fuente, anchor) -> (máscara, x0, y0)
+text_cache = OrderedDict()
+text_cache_limit = 1024 * 1024  # bytes de máscaras
+text_cache_bytes = 0
+text_cache_hits = 0
+text_cache_misses = 0
+
+
+def _read_fixinfo():
+    try:
+        data = ioctl(fb, FBIOGET_FSCREENINFO, bytes(struct.calcsize(FSCREENINFO_FORMAT)))
+    except OSError:
+        return None
+    fields = struct.unpack(FSCREENINFO_FORMAT, data)
+    return {"smem_len": fields[2], "ypanstep": fields[7], "line_length": fields[9]}
+
+
+def _put_screeninfo(fields):
+    try:
+        ioctl(fb, FBIOPUT_VSCREENINFO, struct.pack(VSCREENINFO_FORMAT, *fields))
+        return True
+    except OSError as e:
+        print(f"FBIOPUT_VSCREENINFO failed: {e}")
+        return False
 
 
 def screen_reset():
-    ioctl(
-        fb,
-        0x4601,
-        b"\x80\x02\x00\x00\xe0\x01\x00\x00\x80\x02\x00\x00\xc0\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00 \x00\x00\x00\x00\x00\x00\x00\x10\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x08\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x18\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x80\x00\x00\x00^\x00\x00\x00\x96\x00\x00\x00\x00\x00\x00\x00\xc2\xa2\x00\x00\x1a\x00\x00\x00T\x00\x00\x00\x0c\x00\x00\x00\x1e\x00\x00\x00\x14\x00\x00\x00\x04\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00",
-    )
-    ioctl(fb, 0x4611, 0)
+    """
+    Programa 640x480 a 32 bpp (BGRA) partiendo de la configuración real
+    del driver, con altura virtual doble si lo permite. Deja en pages el
+    número de páginas utilizables.
+    """
+    global pages, line_length, _vscreeninfo
+    pages = 1
+    line_length = screen_width * bytes_per_pixel
+    _vscreeninfo = None
+
+    info = read_screeninfo()
+    if info is None:
+        print(f"{fb_path} is not a framebuffer device, using single buffer")
+        return
+
+    fields = list(info["raw"])
+    fields[0:8] = [screen_width, screen_height, screen_width, screen_height * 2, 0, 0, 32, 0]
+    fields[8:20] = [16, 8, 0, 8, 8, 0, 0, 8, 0, 24, 8, 0]  # rojo, verde, azul, alfa
+    fields[21] = 0  # FB_ACTIVATE_NOW
+    if not _put_screeninfo(fields):
+        fields[3] = screen_height
+        _put_screeninfo(fields)
+
+    try:
+        ioctl(fb, FBIOBLANK, FB_BLANK_UNBLANK)
+    except OSError:
+        pass
+
+    info = read_screeninfo() or info
+    fix = _read_fixinfo()
+    _detect_pixel_order(info)
+    _vscreeninfo = list(info["raw"])
+    if fix:
+        line_length = fix["line_length"] or line_length
+    if (
+        fix
+        and fix["ypanstep"]
+        and info["yres_virtual"] >= screen_height * 2
+        and fix["smem_len"] >= line_length * screen_height * 2
+    ):
+        pages = 2
+
+
+def _pan(page):
+    """Muestra la página indicada, esperando al vsync si está disponible"""
+    global wait_vsync
+    if wait_vsync:
+        try:
+            ioctl(fb, FBIO_WAITFORVSYNC, struct.pack("I", 0))
+        except OSError:
+            wait_vsync = False  # el driver no lo soporta
+    _vscreeninfo[4] = 0
+    _vscreeninfo[5] = page * screen_height
+    ioctl(fb, FBIOPAN_DISPLAY, struct.pack(VSCREENINFO_FORMAT, *_vscreeninfo))
+
+
+def read_screeninfo():
+    """Lee fb_var_screeninfo con FBIOGET_VSCREENINFO; None si no es un framebuffer"""
+    try:
+        data = ioctl(fb, FBIOGET_VSCREENINFO, bytes(struct.calcsize(VSCREENINFO_FORMAT)))
+    except OSError:
+        return None
+    fields = struct.unpack(VSCREENINFO_FORMAT, data)
+    return {
+        "xres": fields[0],
+        "yres": fields[1],
+        "xres_virtual": fields[2],
+        "yres_virtual": fields[3],
+        "xoffset": fields[4],
+        "yoffset": fields[5],
+        "bits_per_pixel": fields[6],
+        "red": fields[8:11],
+        "green": fields[11:14],
+        "blue": fields[14:17],
+        "transp": fields[17:20],
+        "raw": fields,
+    }
+
+
+def _detect_pixel_order(info):
+    global pixel_order
+    if info is None or info["bits_per_pixel"] != 32:
+        return
+    order = [info[channel][0] // 8 for channel in ("red", "green", "blue")]
+    # El alfa ocupa el byte que queda libre aunque el driver no lo declare
+    order.append(({0, 1, 2, 3} - set(order)).pop())
+    pixel_order = tuple(order)
+    native_color.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def native_color(color):
+    """Convierte un color a la tupla que, escrita como RGBA, el framebuffer muestra como color"""
+    if color is None:
+        return None
+    rgba = ImageColor.getcolor(color, "RGBA") if isinstance(color, str) else tuple(color)
+    if len(rgba) == 3:
+        rgba = rgba + (255,)
+    native = [0, 0, 0, 0]
+    for value, index in zip(rgba, pixel_order):
+        native[index] = value
+    return tuple(native)
+
+
+def blank(level=FB_BLANK_POWERDOWN):
+    """Apaga la pantalla (FB_BLANK_UNBLANK la vuelve a encender); False si no se pudo"""
+    if not _initialized:
+        return False
+    try:
+        ioctl(fb, FBIOBLANK, level)
+    except OSError as e:
+        print(f"Error blanking {fb_path}: {e}")
+        return False
+    return True
 
 
 def draw_start():
     global fb, mm
-    fb = os.open("/dev/fb0", os.O_RDWR)
-    mm = mmap.mmap(fb, screen_size)
+    fb = os.open(fb_path, os.O_RDWR)
+    screen_reset()
+    mm = mmap.mmap(fb, line_length * screen_height * pages)
+
+
+def init():
+    """Abre el framebuffer y prepara el lienzo; no hace nada si ya se hizo"""
+    global imgMain, _initialized
+    if _initialized:
+        return
+    draw_start()
+    imgMain = crate_image()
+    draw_active(imgMain)
+    _initialized = True
 
 
 def draw_end():
-    global fb, mm
-    mm.close()
+    global fb, mm, _initialized
+    if not _initialized:
+        return
+    _initialized = False
+    if pages > 1 and _front != 0:
+        # Dejar la pantalla en la página 0 para la siguiente aplicación
+        mm[:line_length * screen_height] = mm[line_length * screen_height:]
+        try:
+            _pan(0)
+        except OSError:
+            pass
+    try:
+        mm.close()
+    except BufferError:
+        pass  # aún hay imágenes que apuntan al mmap; se libera al salir
     os.close(fb)
 
 
+def _buffer_image(buffer, size=(screen_width, screen_height)):
+    """Imagen RGBA que lee y escribe directamente sobre buffer, sin copias"""
+    image = Image.frombuffer("RGBA", size, buffer, "raw", "RGBA", 0, 1)
+    # frombuffer marca la imagen como solo lectura y copiaría al primer dibujo
+    image.readonly = 0
+    image.buffer = buffer
+    return image
+
+
+def _page_buffer(page):
+    page_size = line_length * screen_height
+    return memoryview(mm)[page * page_size:(page + 1) * page_size]
+
+
 def crate_image():
-    image = Image.new("RGBA", (screen_width, screen_height), color="black")
+    global _page_images, _page_ink, _front
+    native_layout = line_length == screen_width * bytes_per_pixel
+    if render_mode == "flip" and pages > 1 and native_layout:
+        # Una imagen por página; se devuelve la oculta
+        _page_images = [_buffer_image(_page_buffer(page)) for page in range(pages)]
+        _page_ink = [(0, 0, screen_width, screen_height)] * pages
+        _front = 0
+        try:
+            _pan(_front)
+            return _page_images[1]
+        except OSError as e:
+            _disable_flip(e)
+    if render_mode == "direct" and native_layout:
+        image = _buffer_image(_page_buffer(_front))
+    else:
+        image = _buffer_image(bytearray(screen_size))
+    image.paste(native_color("black"), (0, 0, screen_width, screen_height))
+    return image
+
+
+def new_surface(width, height, color=None):
+    """Superficie fuera de pantalla en el formato del framebuffer, para blit()"""
+    image = _buffer_image(bytearray(width * height * bytes_per_pixel), (width, height))
+    if color is not None:
+        image.paste(native_color(color), (0, 0, width, height))
     return image
 
 
+def _disable_flip(error):
+    """
+    El driver rechaza FBIOPAN_DISPLAY: una sola página y modo "buffer". Como
+    ya no se puede volver a la página 0, se sigue escribiendo en la que el
+    driver tiene en pantalla.
+    """
+    global render_mode, pages, _page_images, _page_ink, _front, _scanout
+    info = read_screeninfo()
+    visible = info["yoffset"] // screen_height if info else _front
+    if not 0 <= visible < pages:
+        visible = _front
+    print(f"FBIOPAN_DISPLAY failed, using buffer mode on page {visible}: {error}")
+    render_mode = "buffer"
+    pages = 1
+    _page_images = []
+    _page_ink = []
+    _front = 0
+    _scanout = visible * line_length * screen_height
+
+
+def _flip():
+    """
+    Muestra la página en la que se acaba de dibujar y pasa a dibujar en la
+    otra. Si el cambio de página falla pasa a modo "buffer", con el frame
+    copiado a un buffer propio, y devuelve False.
+    """
+    global _front, activeImage, activeDraw, _ink, imgMain
+    page = next(i for i, image in enumerate(_page_images) if image is activeImage)
+    try:
+        _pan(page)
+    except OSError as e:
+        _disable_flip(e)
+        imgMain = _buffer_image(bytearray(screen_size))
+        imgMain.paste(activeImage)
+        draw_active(imgMain)
+        return False
+    _page_ink[page] = _ink
+    _front = page
+    back = (page + 1) % pages
+    activeImage = _page_images[back]
+    activeDraw = ImageDraw.Draw(activeImage)
+    # La página oculta conserva un frame anterior: draw_clear debe borrar lo que tenga
+    _ink = _page_ink[back]
+    return True
+
+
+def draw_update():
+    """
+    Empieza un frame incremental: lo que se dibuje va encima del frame
+    visible, sin draw_clear. En modo "flip" antes se trae a la página
+    oculta lo que cambió en la visible.
+    """
+    global _ink, _frame_synced
+    if _frame_synced or not any(activeImage is page for page in _page_images):
+        return
+    if _back_synced:
+        spans = _last_spans
+    else:
+        # Fuera de lo dibujado en cada página ambas están en negro
+        boxes = [box for box in (_page_ink[_front], _ink) if box is not None]
+        spans = [(min(b[1] for b in boxes), max(b[3] for b in boxes))] if boxes else []
+    front = _page_buffer(_front)
+    back = activeImage.buffer
+    for y0, y1 in spans:
+        back[y0 * line_length:y1 * line_length] = front[y0 * line_length:y1 * line_length]
+    _ink = _page_ink[_front]
+    _frame_synced = True
+
+
 def draw_active(image):
-    global activeImage, activeDraw
+    global activeImage, activeDraw, _ink
     activeImage = image
     activeDraw = ImageDraw.Draw(activeImage)
+    _ink = (0, 0, screen_width, screen_height)
+    mark_full_damage()
+
+
+def mark_damage(box):
+    """Registra una región (x0, y0, x1, y1) como modificada"""
+    global _ink
+    x0 = max(0, int(box[0]))
+    y0 = max(0, int(box[1]))
+    x1 = min(screen_width, int(box[2]) + 1)
+    y1 = min(screen_height, int(box[3]) + 1)
+    if x0 >= x1 or y0 >= y1:
+        return
+    damage.append((x0, y0, x1, y1))
+    if _ink is None:
+        _ink = (x0, y0, x1, y1)
+    else:
+        _ink = (min(_ink[0], x0), min(_ink[1], y0), max(_ink[2], x1), max(_ink[3], y1))
+
+
+def mark_full_damage():
+    """Fuerza que el siguiente draw_paint copie la pantalla completa"""
+    global _full_flush
+    _full_flush = True
+
+
+def _damaged_spans():
+    """Une las regiones dañadas en tramos de filas [y0, y1) ordenados"""
+    if _full_flush:
+        return [(0, screen_height)]
+    spans = []
+    for _, y0, _, y1 in sorted(damage, key=lambda box: box[1]):
+        if spans and y0 <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], y1))
+        else:
+            spans.append((y0, y1))
+    return spans
 
 
 def draw_paint():
-    global activeImage
-    mm.seek(0)
-    mm.write(activeImage.tobytes())
+    """Copia al framebuffer solo las filas dañadas que realmente cambiaron"""
+    global _full_flush, bytes_flushed, bytes_flushed_total, frames_painted, copies, copies_total
+    global _last_spans, _back_synced, _frame_synced, paint_time
+    if overlay is not None:
+        overlay()
+    paint_start = time.perf_counter()
+    stride = screen_width * bytes_per_pixel
+    flushed = 0
+    copies = 0
+    buffer = getattr(activeImage, "buffer", None)
+    in_fb = isinstance(buffer, memoryview) and buffer.obj is mm
+
+    if any(activeImage is page for page in _page_images):
+        _last_spans = _damaged_spans()
+        _back_synced = _frame_synced
+        _frame_synced = False
+        if not _flip():
+            # Sin cambio de página: el frame se copia a la página 0 como en "buffer"
+            buffer = activeImage.buffer
+            in_fb = False
+    elif in_fb:
+        # Modo directo: lo dibujado ya está en pantalla
+        pass
+    elif buffer is None:
+        # Imagen ajena al módulo: no hay buffer reutilizable
+        mark_full_damage()
+        buffer = activeImage.tobytes()
+        copies += 1
+
+    if not in_fb:
+        data = memoryview(buffer)
+        shadow = memoryview(_shadow)
+        for y0, y1 in _damaged_spans():
+            run_start = None
+            # Compara fila a fila con lo que ya está en pantalla y agrupa las
+            # filas distintas consecutivas en una sola escritura
+            for row in range(y0, y1 + 1):
+                changed = False
+                if row < y1:
+                    start = row * stride
+                    changed = _full_flush or data[start:start + stride] != shadow[start:start + stride]
+                if changed and run_start is None:
+                    run_start = row
+                elif not changed and run_start is not None:
+                    begin = run_start * stride
+                    end = row * stride
+                    if line_length == stride:
+                        mm[_scanout + begin:_scanout + end] = data[begin:end]
+                    else:
+                        for r in range(run_start, row):
+                            offset = _scanout + r * line_length
+                            mm[offset:offset + stride] = data[r * stride:(r + 1) * stride]
+                    shadow[begin:end] = data[begin:end]
+                    flushed += end - begin
+                    copies += 2
+                    run_start = None
+
+    damage.clear()
+    _full_flush = False
+    bytes_flushed = flushed
+    bytes_flushed_total += flushed
+    copies_total += copies
+    frames_painted += 1
+    paint_time = time.perf_counter() - paint_start
+    if after_paint is not None:
+        after_paint()
+
+
+def paint_stats():
+    """Estadísticas de bytes escritos al framebuffer"""
+    return {
+        "bytes_flushed": bytes_flushed,
+        "bytes_flushed_total": bytes_flushed_total,
+        "frames_painted": frames_painted,
+        "bytes_per_frame": bytes_flushed_total // frames_painted if frames_painted else 0,
+        "copies": copies,
+        "copies_total": copies_total,
+        "paint_ms": round(paint_time * 1000, 3),
+        "screen_size": screen_size,
+        "render_mode": render_mode,
+    }
 
 
 def draw_clear():
-    global activeDraw
-    activeDraw.rectangle((0, 0, screen_width, screen_height), fill="black")
+    """Borra solo lo que se ha dibujado desde el último borrado"""
+    global activeDraw, _ink
+    if _ink is None:
+        return
+    activeDraw.rectangle(_ink, fill=native_color("black"))
+    damage.append(_ink)
+    _ink = None
+
+
+def _render_text(text, font, anchor):
+    """Devuelve la máscara rasterizada del texto, usando la caché LRU"""
+    global text_cache_bytes, text_cache_hits, text_cache_misses
+    key = (text, font, anchor)
+    entry = text_cache.get(key)
+    if entry is not None:
+        text_cache.move_to_end(key)
+        text_cache_hits += 1
+        return entry
+
+    text_cache_misses += 1
+    x0, y0, x1, y1 = fontFile[font].getbbox(text, anchor=anchor)
+    mask = Image.new("L", (max(1, x1 - x0), max(1, y1 - y0)), 0)
+    ImageDraw.Draw(mask).text((-x0, -y0), text, font=fontFile[font], fill=255, anchor=anchor)
+    entry = (mask, x0, y0)
+
+    text_cache[key] = entry
+    text_cache_bytes += mask.size[0] * mask.size[1]
+    while text_cache_bytes > text_cache_limit and len(text_cache) > 1:
+        _, (old, _, _) = text_cache.popitem(last=False)
+        text_cache_bytes -= old.size[0] * old.size[1]
+    return entry
+
+
+def text_mask(text, font=15, anchor=None):
+    """Máscara L del texto y su desplazamiento (x0, y0) respecto a la posición"""
+    return _render_text(text, font, anchor)
+
+
+def text_cache_stats():
+    total = text_cache_hits + text_cache_misses
+    return {
+        "hits": text_cache_hits,
+        "misses": text_cache_misses,
+        "hit_rate": round(text_cache_hits / total, 3) if total else 0,
+        "entries": len(text_cache),
+        "bytes": text_cache_bytes,
+        "limit": text_cache_limit,
+    }
 
 
 def draw_text(position, text, font=15, color="white", **kwargs):
     global activeDraw
-    activeDraw.text(position, text, font=fontFile[font], fill=color, **kwargs)
+    anchor = kwargs.pop("anchor", None)
+    if kwargs or "\n" in text:
+        # Casos poco comunes: sin caché
+        mark_damage(activeDraw.textbbox(position, text, font=fontFile[font], anchor=anchor, **kwargs))
+        activeDraw.text(position, text, font=fontFile[font], fill=native_color(color), anchor=anchor, **kwargs)
+        return
+
+    # La máscara no depende del color, así que se reutiliza para cualquiera
+    mask, x0, y0 = _render_text(text, font, anchor)
+    x = int(position[0]) + x0
+    y = int(position[1]) + y0
+    mark_damage((x, y, x + mask.size[0], y + mask.size[1]))
+    activeImage.paste(native_color(color), (x, y, x + mask.size[0], y + mask.size[1]), mask)
 
 
 def draw_rectangle(position, fill=None, outline=None, width=1):
     global activeDraw
-    activeDraw.rectangle(position, fill=fill, outline=outline, width=width)
+    mark_damage(position)
+    activeDraw.rectangle(position, fill=native_color(fill), outline=native_color(outline), width=width)
 
 
 def draw_rectangle_r(position, radius, fill=None, outline=None):
     global activeDraw
-    activeDraw.rounded_rectangle(position, radius, fill=fill, outline=outline)
+    mark_damage(position)
+    activeDraw.rounded_rectangle(position, radius, fill=native_color(fill), outline=native_color(outline))
+
+
+def draw_sprite(sprite, position):
+    """Pega un sprite RGBA usando su canal alfa como máscara"""
+    global activeImage
+    x, y = position
+    mark_damage((x, y, x + sprite.size[0] - 1, y + sprite.size[1] - 1))
+    activeImage.paste(sprite, (x, y), sprite)
+
+
+def blit(surface, position, rows=None):
+    """
+    Copia tal cual (sin alfa) las filas [r0, r1) de una superficie de
+    new_surface() al lienzo. Sobre los buffers del módulo es una copia de
+    memoria por fila, sin imágenes intermedias.
+    """
+    global activeImage
+    x, y = position
+    width, height = surface.size
+    r0, r1 = rows if rows is not None else (0, height)
+    mark_damage((x, y + r0, x + width - 1, y + r1 - 1))
+    target = getattr(activeImage, "buffer", None)
+    if target is None or x < 0 or x + width > screen_width or y + r0 < 0 or y + r1 > screen_height:
+        activeImage.paste(surface.crop((0, r0, width, r1)), (x, y + r0))
+        return
+    src = memoryview(surface.buffer)
+    dst = memoryview(target)
+    row_bytes = width * bytes_per_pixel
+    stride = screen_width * bytes_per_pixel
+    offset = (y + r0) * stride + x * bytes_per_pixel
+    for r in range(r0, r1):
+        dst[offset:offset + row_bytes] = src[r * row_bytes:(r + 1) * row_bytes]
+        offset += stride
 
 
 def draw_circle(position, radius, fill=None, outline="white"):
     global activeDraw
-    activeDraw.ellipse(
-        [position[0], position[1], position[0] + radius, position[1] + radius],
-        fill=fill,
-        outline=outline,
-    )
+    box = [position[0], position[1], position[0] + radius, position[1] + radius]
+    mark_damage(box)
+    activeDraw.ellipse(box, fill=native_color(fill), outline=native_color(outline))
+
+
+def draw_line(points, fill="white", width=1):
+    global activeDraw
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    mark_damage([min(xs) - width, min(ys) - width, max(xs) + width, max(ys) + width])
+    activeDraw.line(points, fill=native_color(fill), width=width)
+
+
+def draw_graph(values, position, vmin=0, vmax=100, color="white", fill=None, outline=None):
+    """
+    Dibuja una serie de valores como una línea dentro de un contenedor.
+
+    Args:
+        values (list): Valores, del más antiguo al más reciente
+        position (list): Caja [x0, y0, x1, y1] del contenedor
+        vmin, vmax: Rango del eje vertical
+    """
+    x0, y0, x1, y1 = position
+    draw_rectangle_r(position, 5, fill=fill, outline=outline)
+    if not values:
+        return
+
+    padding = 5
+    span = (vmax - vmin) or 1
+    step = (x1 - x0 - padding * 2) / max(1, len(values) - 1)
+    points = []
+    for i, v in enumerate(values):
+        v = min(max(v, vmin), vmax)
+        points.append((x0 + padding + i * step, y1 - padding - (v - vmin) / span * (y1 - y0 - padding * 2)))
+    if len(points) == 1:
+        points.append((x1 - padding, points[0][1]))
+    draw_line(points, fill=color, width=2)
 
 
 def draw_log(text, fill="Black", outline="black", width=500, height=80, centered=True):
@@ -109,12 +686,46 @@ def draw_log(text, fill="Black", outline="black", width=500, height=80, centered
         draw_text((text_x, text_y), line, anchor=("mm" if centered else "lt"))
 
 
-def draw_scrollable_text(text, x, y, width, height, scroll_offset=0, fill="Black", outline="black"):
+scroll_line_height = 20  # Alto de línea de los textos con scroll
+scroll_padding = 10  # Padding interno de los textos con scroll
+
+
+@lru_cache(maxsize=8)
+def text_advance(font=15):
+    """Avance horizontal de un carácter; la fuente es monoespaciada"""
+    return fontFile[font].getlength("M")
+
+
+def wrap_text(text, width, font=15):
     """
-    Dibuja texto con capacidad de scroll vertical.
-    
+    Divide el texto en líneas que caben en width píxeles.
+
+    Respeta los saltos de línea existentes y corta por espacios; una palabra
+    más larga que la línea se parte.
+    """
+    chars_per_line = max(1, int(width // text_advance(font)))
+    wrapped_lines = []
+    for line in text.split('\n'):
+        while len(line) > chars_per_line:
+            split_at = line[:chars_per_line + 1].rfind(' ')
+            if split_at <= 0:
+                split_at = chars_per_line
+            wrapped_lines.append(line[:split_at].rstrip())
+            line = line[split_at:].lstrip()
+        wrapped_lines.append(line)
+    return wrapped_lines
+
+
+def scroll_visible_lines(height):
+    return (height - (scroll_padding * 2)) // scroll_line_height
+
+
+def draw_scrollable_lines(lines, x, y, width, height, scroll_offset=0, fill="Black", outline="black"):
+    """
+    Dibuja líneas ya divididas con scroll vertical; solo recorre las visibles.
+
     Args:
-        text (str): Texto a dibujar
+        lines (list): Líneas a dibujar
         x (int): Posición X
         y (int): Posición Y
         width (int): Ancho del contenedor
@@ -123,55 +734,41 @@ def draw_scrollable_text(text, x, y, width, height, scroll_offset=0, fill="Black
         fill (str): Color de fondo
         outline (str): Color del borde
     """
-    # Dibuja el contenedor
     draw_rectangle_r([x, y, x + width, y + height], 5, fill=fill, outline=outline)
-    
-    # Preparar el texto
-    font_height = 20  # Altura aproximada de la fuente
-    padding = 10  # Padding interno
-    
-    # Dividir el texto en líneas
-    wrapped_lines = []
-    for line in text.split('\n'):
-        # Calcular cuántos caracteres caben en el ancho disponible
-        chars_per_line = (width - (padding * 2)) // 10  # Aproximadamente 10px por caracter
-        # Envolver el texto
-        if len(line) > chars_per_line:
-            while line:
-                if len(line) <= chars_per_line:
-                    wrapped_lines.append(line)
-                    break
-                split_at = line[:chars_per_line].rfind(' ')
-                if split_at == -1:
-                    split_at = chars_per_line
-                wrapped_lines.append(line[:split_at])
-                line = line[split_at:].lstrip()
-        else:
-            wrapped_lines.append(line)
 
-    # Calcular líneas visibles basado en la altura
-    visible_lines = (height - (padding * 2)) // font_height
-    
-    # Aplicar scroll_offset
+    font_height = scroll_line_height
+    padding = scroll_padding
+    visible_lines = scroll_visible_lines(height)
     start_line = scroll_offset // font_height
-    end_line = min(start_line + visible_lines, len(wrapped_lines))
-    
-    # Dibujar líneas visibles
-    for i, line in enumerate(wrapped_lines[start_line:end_line]):
-        text_y = y + padding + (i * font_height) - (scroll_offset % font_height)
+    end_line = min(start_line + visible_lines, len(lines))
+
+    for i in range(start_line, end_line):
+        text_y = y + padding + ((i - start_line) * font_height) - (scroll_offset % font_height)
         if text_y + font_height > y + height - padding:
             break
-        draw_text((x + padding, text_y), line)
-    
+        if lines[i]:
+            draw_text((x + padding, text_y), lines[i])
+
     # Dibujar indicadores de scroll si es necesario
     if start_line > 0:
         draw_text((x + width // 2, y + padding), "▲", anchor="mm")
-    if end_line < len(wrapped_lines):
+    if end_line < len(lines):
         draw_text((x + width // 2, y + height - padding), "▼", anchor="mm")
 
 
-draw_start()
-screen_reset()
-
-imgMain = crate_image()
-draw_active(imgMain)
+def draw_scrollable_text(text, x, y, width, height, scroll_offset=0, fill="Black", outline="black"):
+    """
+    Dibuja texto con capacidad de scroll vertical.
+    
+    Args:
+        text (str): Texto a dibujar
+        x (int): Posición X
+        y (int): Posición Y
+        width (int): Ancho del contenedor
+        height (int): Alto del contenedor
+        scroll_offset (int): Desplazamiento vertical del scroll
+        fill (str): Color de fondo
+        outline (str): Color del borde
+    """
+    lines = wrap_text(text, width - scroll_padding * 2)
+    draw_scrollable_lines(lines, x, y, width, height, scroll_offset, fill, outline)
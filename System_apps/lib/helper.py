@@ -0,0 +1,561 @@
+"""
+Proceso auxiliar con privilegios para las acciones del sistema.
+
+Se arranca una vez con la aplicación y atiende peticiones por un socket
+Unix: una línea JSON con la acción y, de vuelta, una línea JSON por cada
+línea de salida ({"line": ...}) y una final con el resultado ({"ok": ...,
+"returncode": ..., "error": ..., "commands": ..., "seconds": ...}).
+
+Las acciones sustituyen a los scripts de scripts/: editan sshd_config con
+lib.sshd_config, escriben drop_caches directamente y lanzan los comandos
+sin bash, agrupando las operaciones de systemd (``systemctl enable --now`` en lugar de enable + start + restart).
+Con --fake ROOT los servicios, el sshd_config y drop_caches se simulan en
+ese directorio y el proceso funciona sin root. Con --parent-fd termina en
+cuanto se cierra la tubería heredada de la aplicación, sin despertar
+periódicamente para comprobarlo.
+
+    python3 lib/helper.py --socket /tmp/helper.sock --fake /tmp/fake
+"""
+import json
+import os
+import select
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lib.services as services
+import lib.sshd_config as sshd_config
+
+socket_path = os.environ.get("SYSTEMAPPS_HELPER_SOCKET", "/run/systemapps-helper.sock")
+log_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "helper.log")
+
+DEFAULT_TIMEZONE = "America/Chicago"
+NTP_SERVERS = ("ntp.aliyun.com", "ntp1.aliyun.com", "ntp2.aliyun.com", "ntp.ntsc.ac.cn")
+
+_process = None  # Popen del auxiliar lanzado por start()
+_parent_pipe = None  # extremo de escritura que mantiene vivo al auxiliar
+_fake_root = None  # argumento de start(), para restart()
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Context:
+    """Una petición en curso: envía la salida al cliente y permite cancelarla"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.commands = 0
+        self.cancelled = False
+        self._proc = None
+
+    def emit(self, line):
+        try:
+            self.conn.sendall(json.dumps({"line": line}).encode() + b"\n")
+        except OSError:
+            self.cancel()
+
+    def cancel(self):
+        self.cancelled = True
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def run(self, args, input=None, env=None):
+        """Ejecuta args sin shell reenviando su salida; devuelve el código de salida"""
+        if self.cancelled:
+            raise Cancelled()
+        self.commands += 1
+        if env is not None:
+            env = dict(os.environ, **env)
+        try:
+            self._proc = subprocess.Popen(
+                args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                text=True,
+                errors="replace",
+                env=env,
+                start_new_session=True,
+            )
+        except OSError as e:
+            self.emit(f"Error running {args[0]}: {e}")
+            return 127
+        if input is not None:
+            self._proc.stdin.write(input)
+            self._proc.stdin.close()
+        for line in self._proc.stdout:
+            self.emit(line.rstrip("\n"))
+        returncode = self._proc.wait()
+        self._proc = None
+        if self.cancelled:
+            raise Cancelled()
+        return returncode
+
+
+class SystemBackend:
+    """Acciones reales sobre systemd, /etc/ssh y /proc"""
+
+    config_file = "/etc/ssh/sshd_config"
+    drop_caches_file = "/proc/sys/vm/drop_caches"
+    unit_dirs = ("/etc/systemd/system", "/lib/systemd/system", "/usr/lib/systemd/system")
+
+    def run(self, ctx, args, input=None, env=None):
+        return ctx.run(args, input=input, env=env)
+
+    def unit_exists(self, unit):
+        return any(os.path.exists(os.path.join(d, unit + ".service")) for d in self.unit_dirs)
+
+    def unit_active(self, unit):
+        return services.ssh_active()
+
+    def command_exists(self, name):
+        return shutil.which(name) is not None
+
+    def set_service(self, ctx, unit, enabled, restart=False):
+        """
+        Deja el servicio habilitado/arrancado o deshabilitado/parado con el
+        menor número de llamadas a systemctl
+        """
+        if not enabled:
+            return self.run(ctx, ["systemctl", "disable", "--now", unit])
+        if restart and self.unit_active(unit):
+            # Ya estaba en marcha: hay que reiniciarlo para leer la nueva configuración
+            returncode = self.run(ctx, ["systemctl", "enable", unit])
+            return returncode or self.run(ctx, ["systemctl", "restart", unit])
+        return self.run(ctx, ["systemctl", "enable", "--now", unit])
+
+    # Acciones
+
+    def enable_ssh(self, ctx):
+        if not self.unit_exists("ssh"):
+            ctx.emit("Installing OpenSSH server...")
+            returncode = self._apt_install(ctx, ["openssh-server"])
+            if returncode:
+                return returncode
+        changed = sshd_config.enable_ssh(self.config_file)
+        self.run(ctx, ["chpasswd"], input="root:root\n")
+        returncode = self.set_service(ctx, "ssh", True, restart=changed)
+        if returncode == 0:
+            ctx.emit("SSH enabled successfully")
+        return returncode
+
+    def disable_ssh(self, ctx):
+        returncode = self.set_service(ctx, "ssh", False)
+        if returncode == 0:
+            ctx.emit("SSH disabled successfully")
+        return returncode
+
+    def enable_scp(self, ctx):
+        changed = sshd_config.enable_scp(self.config_file)
+        self.run(ctx, ["chpasswd"], input="root:root\n")
+        returncode = self.set_service(ctx, "ssh", True, restart=changed)
+        if returncode == 0:
+            ctx.emit("SCP enabled successfully")
+        return returncode
+
+    def disable_scp(self, ctx):
+        changed = sshd_config.disable_scp(self.config_file)
+        returncode = self.set_service(ctx, "ssh", True, restart=changed)
+        if returncode == 0:
+            ctx.emit("SCP disabled successfully")
+        return returncode
+
+    def drop_caches(self, ctx):
+        os.sync()
+        with open(self.drop_caches_file, "w") as f:
+            f.write("3\n")
+        # Vaciar la swap si la hay
+        if self.run(ctx, ["swapoff", "-a"]) == 0:
+            self.run(ctx, ["swapon", "-a"])
+        ctx.emit("RAM cleaned")
+        return 0
+
+    def sync_time(self, ctx):
+        if not self.command_exists("ntpdate"):
+            ctx.emit("Installing required packages...")
+            returncode = self._apt_install(ctx, ["ntpdate", "tzdata"])
+            if returncode:
+                return returncode
+
+        timezone = self._lookup_timezone() or DEFAULT_TIMEZONE
+        ctx.emit(f"Setting timezone to {timezone}")
+        self.run(ctx, ["timedatectl", "set-timezone", timezone])
+
+        ctx.emit("Synchronizing time...")
+        for server in NTP_SERVERS:
+            returncode = self.run(ctx, ["ntpdate", "-u", server])
+            if returncode == 0:
+                break
+        else:
+            return returncode
+        self.run(ctx, ["hwclock", "--systohc"])
+        ctx.emit("Time synchronized successfully")
+        return 0
+
+    def _lookup_timezone(self):
+        # urllib arrastra http.client, email...; solo lo necesita el auxiliar
+        import urllib.request
+        try:
+            with urllib.request.urlopen("http://ip-api.com/line?fields=timezone", timeout=5) as response:
+                return response.read().decode().strip()
+        except (OSError, ValueError):
+            return None
+
+    def _apt_install(self, ctx, packages):
+        env = {"DEBIAN_FRONTEND": "noninteractive"}
+        self.run(ctx, ["debconf-set-selections"], input="debconf debconf/frontend select Noninteractive\n")
+        returncode = self.run(ctx, ["apt-get", "update", "-y", "--fix-missing"], env=env)
+        return returncode or self.run(ctx, ["apt-get", "install", "-y"] + packages, env=env)
+
+
+def fake_paths(root):
+    """
+    Apunta lib.services y lib.sshd_config a los ficheros simulados en root.
+    Lo usan el auxiliar con --fake y la aplicación, para que los dos vean
+    el mismo estado. Devuelve (pidfile, sshd_config, proc).
+    """
+    pid_file = os.path.join(root, "sshd.pid")
+    config_file = os.path.join(root, "sshd_config")
+    proc_root = os.path.join(root, "proc")
+    os.makedirs(proc_root, exist_ok=True)
+    services.pid_file = pid_file
+    services.config_file = config_file
+    services.proc_root = proc_root
+    sshd_config.config_file = config_file
+    services.invalidate()
+    return pid_file, config_file, proc_root
+
+
+class FakeBackend(SystemBackend):
+    """
+    Simula servicios y ficheros dentro de root sin privilegios. ssh se
+    "arranca" escribiendo root/sshd.pid y root/proc/<pid>/{comm,status},
+    que es lo que lee lib.services. La aplicación ve el cambio de estado
+    si también llama a fake_paths(root).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.drop_caches_file = os.path.join(root, "drop_caches")
+        self.pid_file, self.config_file, self.proc_root = fake_paths(root)
+        self.log = []  # comandos recibidos
+
+    def unit_exists(self, unit):
+        return True
+
+    def command_exists(self, name):
+        return True
+
+    def _lookup_timezone(self):
+        return None
+
+    def run(self, ctx, args, input=None, env=None):
+        if ctx.cancelled:
+            raise Cancelled()
+        ctx.commands += 1
+        self.log.append(list(args))
+        ctx.emit("$ " + " ".join(args))
+        if args[0] == "systemctl" and args[-1] == "ssh":
+            verbs = set(args[1:-1])
+            if verbs & {"start", "restart", "--now"} and "disable" not in verbs:
+                self._start_ssh()
+            elif "disable" in verbs or "stop" in verbs:
+                self._stop_ssh()
+        services.invalidate()
+        return 0
+
+    def _start_ssh(self):
+        pid = os.getpid()
+        os.makedirs(os.path.join(self.proc_root, str(pid)), exist_ok=True)
+        with open(os.path.join(self.proc_root, str(pid), "comm"), "w") as f:
+            f.write("sshd\n")
+        with open(os.path.join(self.proc_root, str(pid), "status"), "w") as f:
+            f.write("Name:\tsshd\nPPid:\t1\n")
+        with open(self.pid_file, "w") as f:
+            f.write(f"{pid}\n")
+
+    def _stop_ssh(self):
+        try:
+            os.remove(self.pid_file)
+        except OSError:
+            pass
+        shutil.rmtree(os.path.join(self.proc_root, str(os.getpid())), ignore_errors=True)
+
+
+actions = ("enable_ssh", "disable_ssh", "enable_scp", "disable_scp", "drop_caches", "sync_time")
+
+
+class Server:
+    def __init__(self, path, backend, parent_fd=None):
+        self.path = path
+        self.backend = backend
+        # Extremo de lectura de una tubería cuyo otro extremo solo tiene la
+        # aplicación: al morir esta llega EOF y el auxiliar termina
+        self.parent_fd = parent_fd
+        self.parent = os.getppid()  # se devuelve en ping para que la aplicación lo reconozca
+        self._lock = threading.Lock()  # una acción a la vez
+        self._stopping = threading.Event()
+        self._wake = os.pipe()  # despierta el select en stop()
+        self._sock = None
+
+    def bind(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._inode = os.stat(self.path).st_ino
+        self._sock.listen(4)
+
+    def serve_forever(self):
+        """Atiende conexiones; sin peticiones duerme en un select sin timeout"""
+        if self._sock is None:
+            self.bind()
+        fds = [self._sock, self._wake[0]]
+        if self.parent_fd is not None:
+            fds.append(self.parent_fd)
+        try:
+            while not self._stopping.is_set():
+                ready, _, _ = select.select(fds, [], [])
+                if self.parent_fd in ready:
+                    print("Application exited, stopping helper")
+                    break
+                if self._sock in ready:
+                    conn, _ = self._sock.accept()
+                    threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self._sock.close()
+            try:
+                # Solo si sigue siendo el nuestro: un auxiliar nuevo puede haberlo sustituido
+                if os.stat(self.path).st_ino == self._inode:
+                    os.unlink(self.path)
+            except OSError:
+                pass
+
+    def stop(self):
+        self._stopping.set()
+        os.write(self._wake[1], b"\0")
+
+    def _peer_allowed(self, conn):
+        """Solo root o el mismo usuario que el auxiliar pueden pedir acciones"""
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", creds)
+        return uid in (0, os.getuid())
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                if not self._peer_allowed(conn):
+                    return
+                request = json.loads(conn.makefile("rb").readline() or b"{}")
+                action = request.get("action")
+                if action == "ping":
+                    result = {"ok": True, "returncode": 0, "parent": self.parent}
+                elif action == "shutdown":
+                    self.stop()
+                    result = {"ok": True, "returncode": 0}
+                elif action in actions:
+                    result = self._run_action(conn, action)
+                else:
+                    result = {"ok": False, "returncode": -1, "error": f"unknown action {action!r}"}
+                conn.sendall(json.dumps(result).encode() + b"\n")
+            except BrokenPipeError:
+                pass  # el cliente canceló y cerró la conexión
+            except (OSError, ValueError) as e:
+                print(f"Error handling helper request: {e}")
+
+    def _run_action(self, conn, action):
+        ctx = Context(conn)
+        # El cliente cierra la conexión para cancelar
+        threading.Thread(target=self._watch, args=(conn, ctx), daemon=True).start()
+        start = time.monotonic()
+        error = None
+        with self._lock:
+            try:
+                returncode = getattr(self.backend, action)(ctx)
+            except Cancelled:
+                returncode, error = -signal.SIGTERM, "cancelled"
+            except OSError as e:
+                returncode, error = -1, str(e)
+                ctx.emit(f"Error: {e}")
+        seconds = time.monotonic() - start
+        print(f"{action}: exit status {returncode} in {seconds:.2f}s ({ctx.commands} commands)")
+        return {
+            "ok": returncode == 0,
+            "action": action,
+            "returncode": returncode,
+            "error": error,
+            "commands": ctx.commands,
+            "seconds": round(seconds, 3),
+        }
+
+    def _watch(self, conn, ctx):
+        try:
+            data = conn.recv(1)
+        except OSError:
+            data = b""
+        if not data:
+            ctx.cancel()
+
+
+# Cliente
+
+def connect(path=None, timeout=1.0):
+    """Conecta con el auxiliar; OSError si no está en marcha"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path or socket_path)
+    except OSError:
+        sock.close()
+        raise
+    sock.settimeout(None)
+    return sock
+
+
+def call(sock, action, on_line=None):
+    """Envía action por sock y devuelve el resultado final"""
+    sock.sendall(json.dumps({"action": action}).encode() + b"\n")
+    for raw in sock.makefile("rb"):
+        message = json.loads(raw)
+        if "line" in message:
+            if on_line:
+                on_line(message["line"])
+        else:
+            return message
+    raise ConnectionError("helper closed the connection")
+
+
+def request(action, on_line=None, path=None):
+    with connect(path) as sock:
+        return call(sock, action, on_line)
+
+
+def available(path=None):
+    try:
+        return request("ping", path=path)["ok"]
+    except (OSError, ValueError):
+        return False
+
+
+def _ping():
+    try:
+        return request("ping")
+    except (OSError, ValueError):
+        return None
+
+
+def start(fake_root=None, wait=0):
+    """
+    Lanza el auxiliar salvo que ya atienda uno lanzado por este proceso. Uno
+    de otra ejecución no vigila nuestra tubería, así que se le pide que
+    termine y se sustituye. Con wait espera hasta esos segundos a que responda.
+    """
+    global _process, _parent_pipe, _fake_root
+    _fake_root = fake_root
+    reply = _ping()
+    if reply is not None:
+        if reply.get("parent") == os.getpid():
+            return True
+        print(f"Replacing helper started by pid {reply.get('parent')}")
+        try:
+            request("shutdown")
+        except (OSError, ValueError):
+            pass
+    # El auxiliar hereda el extremo de lectura; el de escritura no se hereda
+    # en ningún otro hijo, así que se cierra justo cuando muere la aplicación
+    read_fd, write_fd = os.pipe()
+    args = [sys.executable, os.path.abspath(__file__), "--socket", socket_path, "--parent-fd", str(read_fd)]
+    if fake_root:
+        args += ["--fake", fake_root]
+    try:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, "a") as log:
+            _process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                        start_new_session=True, pass_fds=(read_fd,))
+    except OSError as e:
+        print(f"Error starting helper: {e}")
+        os.close(write_fd)
+        return False
+    finally:
+        os.close(read_fd)
+    if _parent_pipe is not None:
+        os.close(_parent_pipe)
+    _parent_pipe = write_fd
+    return _wait(wait) if wait else True
+
+
+def _wait(seconds):
+    deadline = time.monotonic() + seconds
+    while not available():
+        if time.monotonic() >= deadline or (_process is not None and _process.poll() is not None):
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def restart(wait=1.0):
+    """
+    Para cuando una conexión falla: espera al auxiliar si aún está
+    arrancando y, si murió o no responde, lanza otro. True si responde.
+    """
+    global _process
+    if _process is not None and _process.poll() is None and _wait(wait):
+        return True
+    if _process is not None:
+        _process.kill()
+        _process.wait()
+        _process = None
+    return start(_fake_root, wait=wait)
+
+
+def stop():
+    """Pide al auxiliar lanzado por start() que termine"""
+    global _process, _parent_pipe
+    if _process is None:
+        return
+    try:
+        request("shutdown")
+    except (OSError, ValueError):
+        _process.terminate()
+    _process = None
+    os.close(_parent_pipe)
+    _parent_pipe = None
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Privileged helper for SystemApps")
+    parser.add_argument("--socket", default=socket_path)
+    parser.add_argument("--fake", metavar="ROOT", help="simulate services and files under ROOT")
+    parser.add_argument("--parent-fd", type=int, help="exit when this inherited pipe reaches EOF")
+    args = parser.parse_args()
+
+    sys.stdout.reconfigure(line_buffering=True)
+    if args.parent_fd is not None:
+        os.set_inheritable(args.parent_fd, False)  # que no lo hereden systemctl y compañía
+    backend = FakeBackend(args.fake) if args.fake else SystemBackend()
+    server = Server(args.socket, backend, parent_fd=args.parent_fd)
+    signal.signal(signal.SIGTERM, lambda *_: server.stop())
+    print(f"Helper listening on {args.socket}" + (f" (fake backend in {args.fake})" if args.fake else ""))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Modo de reposo cuando no se toca la consola.
+
+Tras timeout segundos sin entrada el planificador deja de dibujar y de
+ejecutar tareas periódicas, la pantalla se apaga con FBIOBLANK y el bucle
+duerme en un único poll sin timeout hasta que llega un evento. La primera
+pulsación solo despierta: enciende la pantalla y no llega a la aplicación.
+
+Para comprobar el ahorro se cuentan, por estado (activo/reposo), los
+despertares del poll y el tiempo de CPU del proceso.
+
+    SYSTEMAPPS_IDLE_TIMEOUT=60   segundos hasta el reposo (0: nunca)
+    SYSTEMAPPS_IDLE_BLANK=0      no apagar la pantalla en reposo
+"""
+import os
+import time
+
+import lib.graphic as gr
+
+timeout = float(os.environ.get("SYSTEMAPPS_IDLE_TIMEOUT", 60))
+blank_screen = os.environ.get("SYSTEMAPPS_IDLE_BLANK", "1") != "0"
+inhibit = None  # función que devuelve True mientras no se debe entrar en reposo
+on_idle = []  # llamadas al entrar en reposo
+on_active = []  # llamadas al salir
+
+idle = False
+blanked = False
+_last_activity = time.monotonic()
+
+# Por estado: [segundos, despertares, segundos de CPU]
+_totals = {"active": [0.0, 0, 0.0], "idle": [0.0, 0, 0.0]}
+_period = [0.0, 0, 0.0]  # _totals["idle"] al entrar en el reposo actual
+_state_since = time.monotonic()
+_cpu_since = time.process_time()
+
+
+def _state():
+    return "idle" if idle else "active"
+
+
+def _account():
+    """Suma al estado actual el tiempo y la CPU desde el último cambio"""
+    global _state_since, _cpu_since
+    now, cpu = time.monotonic(), time.process_time()
+    totals = _totals[_state()]
+    totals[0] += now - _state_since
+    totals[2] += cpu - _cpu_since
+    _state_since, _cpu_since = now, cpu
+
+
+def deadline():
+    """Momento (time.monotonic) en que se entrará en reposo, o None"""
+    if idle or not timeout:
+        return None
+    return _last_activity + timeout
+
+
+def check(now):
+    """Entra en reposo si venció el plazo; True si está en reposo"""
+    global _last_activity
+    if idle or not timeout or now < _last_activity + timeout:
+        return idle
+    if inhibit is not None and inhibit():
+        _last_activity = now
+        return False
+    _enter()
+    return True
+
+
+def wakeup():
+    """Cuenta una vuelta del poll"""
+    _totals[_state()][1] += 1
+
+
+def touch():
+    """
+    Registra actividad del usuario. Devuelve True si la pantalla estaba
+    apagada, para que el evento que la despertó se descarte.
+    """
+    global _last_activity
+    _last_activity = time.monotonic()
+    if not idle:
+        return False
+    was_blanked = blanked
+    _leave()
+    return was_blanked
+
+
+def _enter():
+    global idle, blanked
+    _account()
+    idle = True
+    _period[:] = _totals["idle"]
+    blanked = blank_screen and gr.blank(gr.FB_BLANK_POWERDOWN)
+    for callback in on_idle:
+        callback()
+
+
+def _leave():
+    global idle, blanked
+    _account()
+    seconds, wakeups, cpu = (total - start for total, start in zip(_totals["idle"], _period))
+    idle = False
+    if blanked:
+        gr.blank(gr.FB_BLANK_UNBLANK)
+        blanked = False
+    for callback in on_active:
+        callback()
+    print(f"Idle for {seconds:.0f}s: {wakeups} wakeups, {cpu * 1000:.0f} ms CPU")
+
+
+def _rate(count, seconds):
+    return count * 60 / seconds if seconds else 0.0
+
+
+def stats():
+    """Tiempo, despertares/min y ms de CPU/min en cada estado"""
+    _account()
+    summary = {"state": _state(), "timeout_s": timeout}
+    for state, (seconds, wakeups, cpu) in _totals.items():
+        summary[state] = {
+            "seconds": round(seconds, 1),
+            "wakeups": wakeups,
+            "wakeups_per_min": round(_rate(wakeups, seconds), 2),
+            "cpu_ms_per_min": round(_rate(cpu * 1000, seconds), 2),
+        }
+    return summary
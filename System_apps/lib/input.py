@@ -1,7 +1,18 @@
+import os
+import select
 import struct
 import time
+from collections import deque, namedtuple
 
 
+EVENT_FORMAT = 'llHHi'
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+EV_KEY = 1
+EV_ABS = 3
+
+# Dispositivos evdev que se leen a la vez
+devices = ["/dev/input/event1"]
+
 code = 0
 codeName = ""
 value = 0
@@ -24,30 +35,215 @@ mapping = {
 	115: "V-",
 }
 
-def check():
-	global type, code, codeName, codeDown, value, valueDown
-	with open("/dev/input/event1", "rb") as f:
-		while True:
-			event = f.read(24)
-			
-			if event:
-				(tv_sec, tv_usec, type, kcode, kvalue) = struct.unpack('llHHI', event)
-				if kvalue != 0:
-					if kvalue != 1:
-						kvalue = -1
-					code = kcode
-					codeName = mapping.get(code, str(code))
-					value = kvalue						
-					return
+Event = namedtuple("Event", "time code codeName value")
+
+# Repetición al mantener pulsada una dirección
+repeat_codes = {"DY", "DX"}
+repeat_delay = 0.35
+repeat_interval = 0.12
+repeat_min_interval = 0.04
+repeat_accel = 0.85
+
+queue = deque(maxlen=64)
+
+# Ganchos de lib/trace: recorder(bytes) recibe los eventos crudos leídos y
+# listener(event) cada evento que se publica con apply()
+recorder = None
+listener = None
+
+_fds = {}  # fd -> ruta del dispositivo
+_pending = {}  # fd -> bytes de un evento incompleto
+_held = {}  # codeName -> [code, value, siguiente repetición, intervalo]
+_opened = False
+
+
+def open_devices(paths=None):
+	"""Abre (una sola vez) los dispositivos de entrada en modo no bloqueante"""
+	global _opened
+	close_devices()
+	for path in (paths if paths is not None else devices):
+		try:
+			fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+		except OSError as e:
+			print(f"Error opening input device {path}: {e}")
+			continue
+		_fds[fd] = path
+		_pending[fd] = b""
+	_opened = True
+
+
+def add_fd(fd, name):
+	"""Lee también de un descriptor ya abierto (p. ej. una tubería de reproducción)"""
+	global _opened
+	if not _opened:
+		open_devices()
+	os.set_blocking(fd, False)
+	_fds[fd] = name
+	_pending[fd] = b""
+
+
+def close_devices():
+	global _opened
+	for fd in list(_fds):
+		try:
+			os.close(fd)
+		except OSError:
+			pass
+	_fds.clear()
+	_pending.clear()
+	_held.clear()
+	_opened = False
+
+
+def fds():
+	"""Descriptores abiertos, para multiplexarlos con otros en un poll"""
+	if not _opened:
+		open_devices()
+	return list(_fds)
+
+
+def set_repeat(delay=None, interval=None, min_interval=None, accel=None):
+	"""Configura la repetición/aceleración de las direcciones mantenidas"""
+	global repeat_delay, repeat_interval, repeat_min_interval, repeat_accel
+	if delay is not None:
+		repeat_delay = delay
+	if interval is not None:
+		repeat_interval = interval
+	if min_interval is not None:
+		repeat_min_interval = min_interval
+	if accel is not None:
+		repeat_accel = accel
+
+
+def held(keyCodeName):
+	"""True mientras la tecla sigue pulsada"""
+	return keyCodeName in _held
+
+
+def next_deadline():
+	"""Momento (time.monotonic) de la próxima repetición pendiente, o None"""
+	deadlines = [h[2] for name, h in _held.items() if name in repeat_codes]
+	return min(deadlines) if deadlines else None
+
+
+def _handle(now, etype, kcode, kvalue):
+	if etype == EV_ABS:
+		if kcode not in mapping:
+			return  # ejes analógicos
+	elif etype != EV_KEY:
+		return
+
+	name = mapping.get(kcode, str(kcode))
+	if kvalue == 0:
+		_held.pop(name, None)
+		return
+	if kvalue == 2:
+		return  # autorepetición del kernel; la repetición la generamos nosotros
+
+	queue.append(Event(now, kcode, name, kvalue))
+	_held[name] = [kcode, kvalue, now + repeat_delay, repeat_interval]
+
+
+def _read(fd, now):
+	try:
+		data = os.read(fd, EVENT_SIZE * 32)
+	except BlockingIOError:
+		return
+	except OSError as e:
+		print(f"Error reading input device {_fds.get(fd)}: {e}")
+		data = b""
+	if not data:
+		# Dispositivo desconectado o tubería cerrada
+		os.close(fd)
+		_fds.pop(fd, None)
+		_pending.pop(fd, None)
+		return
+
+	data = _pending[fd] + data
+	end = len(data) - len(data) % EVENT_SIZE
+	if recorder is not None and end:
+		recorder(data[:end])
+	for offset in range(0, end, EVENT_SIZE):
+		(tv_sec, tv_usec, etype, kcode, kvalue) = struct.unpack_from(EVENT_FORMAT, data, offset)
+		_handle(now, etype, kcode, kvalue)
+	_pending[fd] = data[end:]
+
+
+def _repeat(now):
+	queued = {event.codeName for event in queue}
+	for name, h in _held.items():
+		if name not in repeat_codes or h[2] > now:
+			continue
+		if name not in queued:
+			# No se acumulan repeticiones si la UI va por detrás
+			queue.append(Event(now, h[0], name, h[1]))
+		h[3] = max(repeat_min_interval, h[3] * repeat_accel)
+		h[2] = now + h[3]
+
+
+def pump(ready=None):
+	"""Lee los descriptores listos (o todos) y genera las repeticiones vencidas"""
+	now = time.monotonic()
+	for fd in (ready if ready is not None else list(_fds)):
+		if fd in _fds:
+			_read(fd, now)
+	_repeat(now)
+
+
+def poll(timeout=None):
+	"""Espera hasta que haya eventos en la cola. Devuelve False si vence el timeout"""
+	if not _opened:
+		open_devices()
+	deadline = None if timeout is None else time.monotonic() + timeout
+
+	while not queue:
+		now = time.monotonic()
+		wait = None if deadline is None else max(0, deadline - now)
+		repeat_at = next_deadline()
+		if repeat_at is not None:
+			wait = max(0, repeat_at - now) if wait is None else min(wait, max(0, repeat_at - now))
+		if not _fds and wait is None:
+			return False  # nada que esperar
+		ready, _, _ = select.select(list(_fds), [], [], wait)
+		pump(ready)
+		if not queue and deadline is not None and time.monotonic() >= deadline:
+			return False
+	return True
+
+
+def drain():
+	"""Devuelve y vacía todos los eventos en cola"""
+	events = list(queue)
+	queue.clear()
+	return events
+
+
+def apply(event):
+	"""Publica un evento en code/codeName/value para key()"""
+	global code, codeName, value
+	code = event.code
+	codeName = event.codeName
+	value = event.value
+	if listener is not None:
+		listener(event)
+
+
+def check(timeout=None):
+	"""Toma el siguiente evento de la cola; bloquea como mucho timeout segundos"""
+	if poll(timeout):
+		apply(queue.popleft())
+		return True
+	reset_input()
+	return False
 
 def key(keyCodeName, keyValue = 99):
 	global code, codeName, value
 	if codeName == keyCodeName:
-		if keyValue != 99: 
+		if keyValue != 99:
 			return value == keyValue
 		return True
 
 def reset_input():
 	global codeName, value
 	codeName = ""
-	value = 0
\ No newline at end of file
+	value = 0
@@ -0,0 +1,159 @@
+"""
+Ejecución de scripts en segundo plano.
+
+Un Job lanza el comando en su propia sesión, lee stdout/stderr línea a
+línea en un hilo y guarda las últimas líneas para mostrarlas en pantalla
+mientras el bucle principal sigue atendiendo la entrada. HelperJob hace lo
+mismo con una acción del proceso auxiliar (lib.helper).
+"""
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+from collections import deque
+
+import lib.helper as helper
+
+
+class Job:
+    def __init__(self, title, args, max_lines=200, on_update=None):
+        self.title = title
+        self.args = args
+        self.on_update = on_update
+        self.lines = deque(maxlen=max_lines)
+        self.returncode = None
+        self.cancelled = False
+        self.started = None
+        self.finished = None
+        self._proc = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self.started = time.monotonic()
+        try:
+            self._proc = subprocess.Popen(
+                self.args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                text=True,
+                errors="replace",
+                bufsize=1,
+                start_new_session=True,
+            )
+        except OSError as e:
+            self._append(f"Error: {e}")
+            self._finish(-1)
+            return self
+        self._thread = threading.Thread(target=self._run, name=f"job-{self.title}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _append(self, line):
+        with self._lock:
+            self.lines.append(line)
+        if self.on_update:
+            self.on_update()
+
+    def _finish(self, returncode):
+        self.returncode = returncode
+        self.finished = time.monotonic()
+        print(f"{self.title}: {self.status_text()}")
+        if self.on_update:
+            self.on_update()
+
+    def _run(self):
+        for line in self._proc.stdout:
+            self._append(line.rstrip("\n"))
+        self._proc.stdout.close()
+        self._finish(self._proc.wait())
+
+    def cancel(self):
+        """Termina el script y todos sus hijos"""
+        if not self.running or self._proc is None:
+            return
+        self.cancelled = True
+        try:
+            os.killpg(self._proc.pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+    @property
+    def running(self):
+        return self.finished is None
+
+    @property
+    def succeeded(self):
+        return self.returncode == 0 and not self.cancelled
+
+    def elapsed(self):
+        if self.started is None:
+            return 0
+        return (self.finished or time.monotonic()) - self.started
+
+    def tail(self, count):
+        """Últimas count líneas de salida"""
+        with self._lock:
+            return list(self.lines)[-count:]
+
+    def status_text(self):
+        if self.running:
+            return "Running..."
+        if self.cancelled:
+            return "Cancelled"
+        if self.returncode == 0:
+            return "Success!"
+        return f"Failed (exit status {self.returncode})"
+
+
+def run_script(script_path, on_update=None):
+    """Lanza un script de bash como Job"""
+    title = os.path.splitext(os.path.basename(script_path))[0]
+    return Job(title, ["bash", script_path], on_update=on_update).start()
+
+
+class HelperJob(Job):
+    """Acción del auxiliar; la salida llega por el socket línea a línea"""
+
+    def __init__(self, title, action, max_lines=200, on_update=None):
+        super().__init__(title, [action], max_lines=max_lines, on_update=on_update)
+        self.action = action
+        self.result = None
+        self._sock = None
+
+    def start(self):
+        """Conecta antes de lanzar el hilo: OSError si el auxiliar no responde"""
+        self._sock = helper.connect()
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"job-{self.title}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            with self._sock:
+                self.result = helper.call(self._sock, self.action, on_line=self._append)
+        except (OSError, ValueError) as e:
+            if not self.cancelled:
+                self._append(f"Error: {e}")
+            self._finish(-1)
+            return
+        self._finish(self.result["returncode"])
+
+    def cancel(self):
+        """Cerrar la conexión hace que el auxiliar termine el comando en curso"""
+        if not self.running or self._sock is None:
+            return
+        self.cancelled = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def run_action(title, action, on_update=None):
+    """Lanza action en el auxiliar como Job; OSError si no está disponible"""
+    return HelperJob(title, action, on_update=on_update).start()
@@ -0,0 +1,93 @@
+"""
+Layout cacheado del contenido de las secciones de los manuales.
+
+Cada sección se divide en líneas una sola vez, con el avance real de la
+fuente monoespaciada, y el resultado (líneas y alto total) se guarda por
+(manual, sección, ancho, versión del fichero). Dibujar y calcular el
+scroll máximo solo consultan esa caché. lib.prefetch la rellena desde otro
+hilo; el cálculo se hace fuera del lock y, si dos hilos piden la misma
+sección, el segundo espera al primero.
+"""
+import threading
+from collections import OrderedDict
+
+import lib.graphic as gr
+
+cache_limit = 64  # secciones guardadas
+
+_cache = OrderedDict()
+_lock = threading.RLock()
+_building = {}  # clave -> Event de un cálculo en curso
+hits = 0
+misses = 0
+
+
+class SectionLayout:
+    def __init__(self, lines):
+        self.lines = lines
+        self.total_height = len(lines) * gr.scroll_line_height
+
+    def max_scroll(self, height):
+        """Máximo desplazamiento para un contenedor de height píxeles"""
+        visible = gr.scroll_visible_lines(height)
+        return max(0, (len(self.lines) - visible) * gr.scroll_line_height)
+
+
+def build(section, content, width):
+    """Divide el título y los pasos de una sección en líneas de width píxeles"""
+    lines = gr.wrap_text(section, width)
+    lines.append("")
+    for step, description in content.items():
+        description = description.replace('\n', ' ').strip()
+        lines.extend(gr.wrap_text(step, width))
+        lines.extend(gr.wrap_text(description, width))
+        lines.append("")
+    while lines and not lines[-1]:
+        lines.pop()
+    return SectionLayout(lines)
+
+
+def section_layout(manual, section, content, width, stamp=None):
+    """
+    Layout de la sección, calculado solo la primera vez. content puede ser
+    una función que devuelve el contenido, para no leerlo si ya hay layout.
+    stamp identifica la versión del fichero (p. ej. [mtime_ns, tamaño]);
+    si cambia, los layouts anteriores del manual se descartan.
+    """
+    global hits, misses
+    stamp = tuple(stamp) if stamp is not None else None
+    key = (manual, section, width, stamp)
+    while True:
+        with _lock:
+            layout = _cache.get(key)
+            if layout is not None:
+                _cache.move_to_end(key)
+                hits += 1
+                return layout
+            building = _building.get(key)
+            if building is None:
+                building = _building[key] = threading.Event()
+                misses += 1
+                break
+        building.wait()
+
+    try:
+        layout = build(section, content() if callable(content) else content, width)
+        with _lock:
+            for old in [k for k in _cache if k[0] == manual and k[3] != stamp]:
+                del _cache[old]
+            _cache[key] = layout
+            while len(_cache) > cache_limit:
+                _cache.popitem(last=False)
+        return layout
+    finally:
+        with _lock:
+            del _building[key]
+        building.set()
+
+
+def invalidate(manual=None):
+    """Olvida los layouts de un manual (o todos)"""
+    with _lock:
+        for key in [k for k in _cache if manual is None or k[0] == manual]:
+            del _cache[key]
@@ -0,0 +1,186 @@
+"""
+Carga perezosa de manuales JSON grandes.
+
+Al abrir un manual solo se leen los nombres de las secciones y el rango
+de bytes de cada una. Ese índice se calcula una vez recorriendo el fichero
+con una expresión regular sobre un mmap y se guarda al lado del JSON
+(``.<nombre>.offsets``); las siguientes aperturas solo leen ese fichero.
+Cada sección se decodifica al pedirla y solo se guardan las últimas. Se
+puede leer desde varios hilos (lib.prefetch).
+"""
+import json
+import mmap
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+sections_kept = 2  # secciones decodificadas que se mantienen en memoria
+
+# Cadenas completas (con escapes) y la puntuación estructural de JSON
+_token = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\],:]', re.S)
+
+
+def parsed_size(value):
+    """Bytes aproximados de un valor decodificado de JSON (dicts, listas y cadenas)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += parsed_size(key) + parsed_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += parsed_size(item)
+    return size
+
+
+def sidecar_path(path):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f".{name[:-5] if name.endswith('.json') else name}.offsets")
+
+
+def scan(data):
+    """Devuelve [(sección, inicio, fin)] del objeto de primer nivel de data"""
+    sections = []
+    depth = 0
+    key = None
+    start = None
+    for match in _token.finditer(data):
+        token = match.group()
+        char = token[:1]
+        if char == b'"':
+            if depth == 1 and start is None:
+                key = json.loads(token)
+        elif char in b'{[':
+            if depth == 0 and char != b'{':
+                raise ValueError("manual is not a JSON object")
+            depth += 1
+        elif char in b'}]':
+            depth -= 1
+            if depth == 0 and start is not None:
+                sections.append((key, start, match.start()))
+                start = None
+        elif depth == 1:
+            if char == b':':
+                start = match.end()
+            elif start is not None:  # coma entre secciones
+                sections.append((key, start, match.start()))
+                start = None
+    if depth != 0:
+        raise ValueError("unterminated JSON object")
+    return sections
+
+
+class LazyManual(Mapping):
+    """Manual de solo lectura que se comporta como el dict de json.load"""
+
+    def __init__(self, path):
+        self.path = path
+        self.sections = OrderedDict()  # sección -> (inicio, fin)
+        self.stamp = None
+        self.bytes = 0  # índice y secciones decodificadas
+        self.on_resize = None  # llamada cuando crece bytes (p. ej. ManualCache)
+        self._parsed = OrderedDict()  # sección -> (valor, bytes)
+        self._lock = threading.RLock()
+        self._loading = {}  # sección -> Event de una lectura en curso en otro hilo
+        self._load_offsets()
+
+    def _load_offsets(self):
+        self.sections.clear()
+        self._parsed.clear()
+        for name, start, end in self._offsets():
+            self.sections[name] = (start, end)
+        self.bytes = parsed_size(self.sections)
+
+    def _offsets(self):
+        st = os.stat(self.path)
+        stamp = self.stamp = [st.st_mtime_ns, st.st_size]
+        sidecar = sidecar_path(self.path)
+        try:
+            with open(sidecar, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["stamp"] == stamp:
+                return cached["sections"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        with open(self.path, "rb") as f:
+            if st.st_size == 0:
+                raise ValueError("empty manual")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                sections = scan(data)
+
+        try:
+            tmp = sidecar + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"stamp": stamp, "sections": sections}, f)
+            os.replace(tmp, sidecar)
+        except OSError as e:
+            # Sin permisos de escritura: el índice vive solo en memoria
+            print(f"Error saving manual offsets {sidecar}: {e}")
+        return sections
+
+    def _read_section(self, name):
+        with open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            with self._lock:
+                if [st.st_mtime_ns, st.st_size] != self.stamp:
+                    # El fichero cambió desde que se indexó
+                    self._load_offsets()
+                    if name not in self.sections:
+                        return {}
+                start, end = self.sections[name]
+            f.seek(start)
+            raw = f.read(end - start)
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            print(f"Error loading section {name!r} of {self.path}: {e}")
+            return {}
+
+    def __getitem__(self, name):
+        while True:
+            with self._lock:
+                entry = self._parsed.get(name)
+                if entry is not None:
+                    self._parsed.move_to_end(name)
+                    return entry[0]
+                loading = self._loading.get(name)
+                if loading is None:
+                    loading = self._loading[name] = threading.Event()
+                    break
+            loading.wait()  # otro hilo la está leyendo
+
+        # Lectura y decodificación sin el lock: otras secciones siguen disponibles
+        try:
+            value = self._read_section(name)
+            size = parsed_size(value)
+            with self._lock:
+                self._parsed[name] = (value, size)
+                self.bytes += size
+                while len(self._parsed) > sections_kept:
+                    _, (_, dropped) = self._parsed.popitem(last=False)
+                    self.bytes -= dropped
+        finally:
+            with self._lock:
+                del self._loading[name]
+            loading.set()
+        on_resize = self.on_resize
+        if on_resize:
+            on_resize()
+        return value
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __contains__(self, name):
+        return name in self.sections
+
+
+def load(path):
+    """Abre un manual leyendo solo su índice de secciones"""
+    return LazyManual(path)
@@ -0,0 +1,126 @@
+"""
+Caché LRU de manuales abiertos.
+
+Guarda los LazyManual (índice de secciones y secciones ya decodificadas)
+por ruta, de modo que volver a un manual reciente no lee ni decodifica
+nada. Cada entrada se valida con el (mtime, tamaño) del fichero y el
+total se limita por bytes decodificados, no por número de manuales:
+al superar el presupuesto se descartan los menos usados. La usan a la vez
+el bucle principal y el hilo de lib.prefetch; si los dos piden el mismo
+manual, el segundo espera a que el primero termine de abrirlo.
+
+    SYSTEMAPPS_MANUAL_CACHE_KB=4096  presupuesto en KiB
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import lib.lazy_manual as lazy_manual
+
+budget = int(os.environ.get("SYSTEMAPPS_MANUAL_CACHE_KB", 4096)) * 1024
+
+
+class ManualCache:
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self.entries = OrderedDict()  # ruta -> LazyManual, del menos al más usado
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0  # entradas descartadas porque el fichero cambió
+        self._lock = threading.RLock()
+        self._loading = {}  # ruta -> Event de una apertura en curso en otro hilo
+
+    @property
+    def bytes(self):
+        with self._lock:
+            return sum(manual.bytes for manual in self.entries.values())
+
+    def _lookup(self, path):
+        manual = self.entries.get(path)
+        if manual is None:
+            return None
+        try:
+            st = os.stat(path)
+            current = [st.st_mtime_ns, st.st_size] == manual.stamp
+        except OSError:
+            current = False
+        if not current:
+            self.stale += 1
+            self.discard(path)
+            return None
+        self.entries.move_to_end(path)
+        return manual
+
+    def get(self, path):
+        """LazyManual de path; ValueError/OSError si no se puede abrir"""
+        while True:
+            with self._lock:
+                manual = self._lookup(path)
+                if manual is not None:
+                    self.hits += 1
+                    return manual
+                loading = self._loading.get(path)
+                if loading is None:
+                    loading = self._loading[path] = threading.Event()
+                    self.misses += 1
+                    break
+            loading.wait()  # otro hilo lo está abriendo; después será un acierto
+
+        # La lectura se hace sin el lock para no bloquear otras consultas
+        try:
+            manual = lazy_manual.load(path)
+            with self._lock:
+                manual.on_resize = self._trim
+                self.entries[path] = manual
+                self._trim()
+            return manual
+        finally:
+            with self._lock:
+                del self._loading[path]
+            loading.set()
+
+    def discard(self, path):
+        with self._lock:
+            manual = self.entries.pop(path, None)
+            if manual is not None:
+                manual.on_resize = None
+
+    def clear(self):
+        with self._lock:
+            for path in list(self.entries):
+                self.discard(path)
+
+    def _trim(self):
+        """Descarta los menos usados hasta caber; el más reciente se queda siempre"""
+        with self._lock:
+            total = self.bytes
+            while total > self.budget and len(self.entries) > 1:
+                path, manual = next(iter(self.entries.items()))
+                total -= manual.bytes
+                self.discard(path)
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "stale": self.stale,
+        }
+
+
+cache = ManualCache(budget)
+
+
+def get(path):
+    return cache.get(path)
+
+
+def stats():
+    return cache.stats()
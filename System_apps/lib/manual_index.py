@@ -0,0 +1,192 @@
+"""
+Índice de búsqueda persistente sobre el árbol de manuales.
+
+Guarda en SQLite (FTS5 si está disponible) los directorios, los nombres
+de los manuales, los títulos de las secciones y el texto de los pasos.
+update() compara mtime y tamaño de cada JSON con lo indexado, así que
+solo se vuelven a leer los ficheros que cambiaron. Mientras el índice se
+construye, scan_search() da los mismos resultados recorriendo el árbol.
+"""
+import os
+import sqlite3
+
+import lib.lazy_manual as lazy_manual
+
+
+class ManualIndex:
+    def __init__(self, manuals_root, db_path=None):
+        self.manuals_root = manuals_root
+        self.db_path = db_path or os.path.join(manuals_root, ".index.sqlite")
+        self.db = sqlite3.connect(self.db_path)
+        self.fts = self._create_tables()
+
+    def _create_tables(self):
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER)"
+        )
+        try:
+            self.db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5("
+                "kind UNINDEXED, path UNINDEXED, section UNINDEXED, title, body, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            fts = True
+        except sqlite3.OperationalError:
+            # SQLite sin FTS5: tabla normal y búsqueda con LIKE
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS entries (kind TEXT, path TEXT, section TEXT, title TEXT, body TEXT)"
+            )
+            fts = False
+        self.db.commit()
+        return fts
+
+    def close(self):
+        self.db.close()
+
+    def _scan(self):
+        """Devuelve (directorios, {json: (mtime_ns, size)}) con rutas relativas"""
+        dirs = []
+        files = {}
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            try:
+                entries = list(os.scandir(os.path.join(self.manuals_root, relative)))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                path = os.path.join(relative, entry.name)
+                if entry.is_dir():
+                    dirs.append(path)
+                    pending.append(path)
+                elif entry.name.endswith(".json"):
+                    st = entry.stat()
+                    files[path] = (st.st_mtime_ns, st.st_size)
+        return dirs, files
+
+    def _index_manual(self, path):
+        full_path = os.path.join(self.manuals_root, path)
+        try:
+            data = lazy_manual.load(full_path)
+        except Exception as e:
+            print(f"Error indexing manual {path}: {e}")
+            return
+
+        rows = [("manual", path, None, os.path.basename(path)[:-5], "")]
+        for section, steps in data.items():
+            rows.append(("section", path, section, section, ""))
+            if isinstance(steps, dict):
+                for step, description in steps.items():
+                    rows.append(("step", path, section, step, str(description)))
+        self.db.executemany(
+            "INSERT INTO entries (kind, path, section, title, body) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    def update(self):
+        """Sincroniza el índice con el disco; devuelve cuántos manuales se releyeron"""
+        dirs, files = self._scan()
+        indexed = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self.db.execute("SELECT path, mtime_ns, size FROM files")
+        }
+        changed = [path for path, stamp in files.items() if indexed.get(path) != stamp]
+        removed = [path for path in indexed if path not in files]
+
+        with self.db:
+            for path in changed + removed:
+                self.db.execute("DELETE FROM entries WHERE path = ? AND kind != 'dir'", (path,))
+                self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+            for path in changed:
+                self._index_manual(path)
+                self.db.execute("INSERT INTO files VALUES (?, ?, ?)", (path, *files[path]))
+
+            # Los directorios son pocos: se reescriben enteros
+            self.db.execute("DELETE FROM entries WHERE kind = 'dir'")
+            self.db.executemany(
+                "INSERT INTO entries (kind, path, section, title, body) VALUES ('dir', ?, NULL, ?, '')",
+                [(path, os.path.basename(path)) for path in dirs],
+            )
+        return len(changed)
+
+    def search(self, query, limit=30):
+        """Busca por prefijo de cada palabra; devuelve dicts ordenados por relevancia"""
+        terms = [term for term in query.split() if term]
+        if not terms:
+            return []
+
+        if self.fts:
+            match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+            cursor = self.db.execute(
+                "SELECT kind, path, section, title, body FROM entries WHERE entries MATCH ? "
+                "ORDER BY bm25(entries, 0.0, 0.0, 0.0, 10.0, 1.0) LIMIT ?",
+                (match, limit),
+            )
+        else:
+            where = " AND ".join("(title LIKE ? OR body LIKE ?)" for _ in terms)
+            params = []
+            for term in terms:
+                params += [f"%{term}%", f"%{term}%"]
+            cursor = self.db.execute(
+                f"SELECT kind, path, section, title, body FROM entries WHERE {where} LIMIT ?",
+                (*params, limit),
+            )
+        return [
+            {"kind": kind, "path": path, "section": section, "title": title, "body": body}
+            for kind, path, section, title, body in cursor
+        ]
+
+
+def _matches(terms, title, body):
+    text = (title + "\n" + body).casefold()
+    return all(term in text for term in terms)
+
+
+def scan_search(manuals_root, query, limit=30):
+    """
+    Búsqueda lineal sin índice, como la de LIKE: cada palabra debe aparecer
+    en el título o en el texto. Devuelve dicts como ManualIndex.search.
+    """
+    terms = [term.casefold() for term in query.split() if term]
+    if not terms:
+        return []
+    results = []
+    pending = [""]
+    while pending and len(results) < limit:
+        relative = pending.pop(0)
+        try:
+            entries = sorted(os.scandir(os.path.join(manuals_root, relative)), key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            path = os.path.join(relative, entry.name)
+            if entry.is_dir():
+                pending.append(path)
+                rows = [("dir", None, entry.name, "")]
+            elif entry.name.endswith(".json"):
+                rows = _manual_rows(os.path.join(manuals_root, path), entry.name[:-5])
+            else:
+                continue
+            for kind, section, title, body in rows:
+                if _matches(terms, title, body):
+                    results.append({"kind": kind, "path": path, "section": section, "title": title, "body": body})
+                    if len(results) >= limit:
+                        return results
+    return results
+
+
+def _manual_rows(full_path, name):
+    yield "manual", None, name, ""
+    try:
+        data = lazy_manual.load(full_path)
+    except Exception as e:
+        print(f"Error searching manual {full_path}: {e}")
+        return
+    for section, steps in data.items():
+        yield "section", section, section, ""
+        if isinstance(steps, dict):
+            for step, description in steps.items():
+                yield "step", section, step, str(description)
@@ -1,25 +1,82 @@
-import json
 import os
+import sqlite3
+import threading
 import time
-import textwrap
 import lib.graphic as gr
+import lib.idle as idle
 import lib.input as input
+import lib.layout as layout
+import lib.manual_cache as manual_cache
+import lib.manual_index as manual_index
+import lib.perf as perf
+import lib.prefetch as prefetch
+import lib.widgets as widgets
+from lib.widgets import button_circle, row_list
+
+# Teclado en pantalla de la búsqueda (" " es el espacio)
+search_keys = ["abcdefghij", "klmnopqrst", "uvwxyz -._", "0123456789"]
+search_visible_results = 4
+search_icons = {"dir": "📁 ", "manual": "📄 ", "section": "§ ", "step": "• "}
+prefetch_ahead = 2  # entradas tras la seleccionada que también se preparan
 
 class ManualReader:
     def __init__(self, manuals_root):
         self.manuals_root = manuals_root
-        self.selected_position = 0
-        self.scroll_offset = 0
         self.content_scroll = 0
-        self.visible_items = 7
         self.path_history = []
         self.current_items = []
-        self.menu_len = 0
+        self.list = widgets.VirtualList((20, 130), 600, 280)  # directorio o secciones
+        self.list_only = False  # el último input solo movió la selección
+        self.frame_drawn = False  # ya hay un frame completo del lector en pantalla
         self.in_manual = False
         self.in_section = False
         self.current_manual_data = None
+        self.current_manual_path = None
         self.current_section = None
+        self.content_box = (20, 80, 600, 340)  # x, y, ancho, alto del texto de sección
+        self.in_search = False
+        self.search_query = ""
+        self.search_results = []
+        self.search_on_results = False
+        self.search_key = (0, 0)  # fila, columna del teclado
+        self.search_position = 0
+        self.search_scroll = 0
+        self.prefetcher = prefetch.start()
+        self._prefetch_key = None  # última selección para la que se pidió prefetch
+        # El índice se pone al día en segundo plano; hasta entonces se busca
+        # recorriendo el árbol (manual_index.scan_search)
+        self.index = None
+        self.index_ready = threading.Event()
+        self.indexing = True
+        threading.Thread(target=self._update_index, name="manual-index", daemon=True).start()
         self._load_current_directory()
+        self._prefetch()
+
+    def _update_index(self):
+        """Hilo: sincroniza el índice con el disco usando su propia conexión"""
+        try:
+            start = time.perf_counter()
+            index = manual_index.ManualIndex(self.manuals_root)
+            try:
+                changed = index.update()
+            finally:
+                index.close()
+            print(f"Manual index: {changed} manuals updated in {(time.perf_counter() - start) * 1000:.0f} ms")
+            self.index_ready.set()
+        except sqlite3.Error as e:
+            print(f"Error updating manual index: {e}")
+        finally:
+            self.indexing = False
+
+    def _open_index(self):
+        """Índice para buscar desde el hilo principal, o None si aún no está listo"""
+        if self.index is None and self.index_ready.is_set():
+            try:
+                self.index = manual_index.ManualIndex(self.manuals_root)
+            except sqlite3.Error as e:
+                print(f"Error opening manual index: {e}")
+                self.index_ready.clear()
+        return self.index
     
     def _load_current_directory(self):
         """Carga el contenido del directorio actual"""
@@ -27,38 +84,52 @@ class ManualReader:
         self.current_items = []
         
         try:
-            items = os.listdir(current_path)
-            
-            # Primero directorios
-            for item in sorted(items):
-                full_path = os.path.join(current_path, item)
-                if os.path.isdir(full_path):
-                    self.current_items.append({"name": item, "type": "dir"})
-            
-            # Luego archivos JSON
-            for item in sorted(items):
-                if item.endswith('.json'):
-                    self.current_items.append({
-                        "name": item[:-5],
-                        "type": "file"
-                    })
-                    
-            self.menu_len = len(self.current_items)
+            dirs = []
+            files = []
+            # Un solo recorrido; is_dir() usa el tipo que ya devuelve el kernel
+            with os.scandir(current_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir():
+                        dirs.append(entry.name)
+                    elif entry.name.endswith('.json'):
+                        files.append(entry.name[:-5])
+
+            # Primero directorios, luego archivos JSON
+            self.current_items = [{"name": name, "type": "dir"} for name in sorted(dirs)]
+            self.current_items += [{"name": name, "type": "file"} for name in sorted(files)]
             
         except Exception as e:
             print(f"Error loading directory: {e}")
             self.current_items = []
-            self.menu_len = 0
+        self._show_directory()
+
+    def _show_directory(self, selected=0):
+        icons = {"dir": "📁 ", "file": "📄 "}
+        self.list.set_items(icons[item["type"]] + item["name"] for item in self.current_items)
+        self.list.select(selected)
 
     def _load_json(self, json_path):
-        """Carga un archivo JSON"""
+        """
+        Abre un manual; las secciones se leen del disco al abrirlas. Los
+        manuales recientes salen de manual_cache sin tocar el disco.
+        """
         try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return manual_cache.get(json_path)
         except Exception as e:
             print(f"Error loading manual: {e}")
             return {}
 
+    def _open_manual(self, json_path):
+        self.current_manual_data = self._load_json(json_path)
+        self.current_manual_path = json_path
+        self.in_manual = True
+        self.in_section = False
+        self.current_section = None
+        self.list.set_items(self.current_manual_data.keys())
+        self.list.select(0)
+
     def get_current_path(self):
         if not self.path_history:
             return "/"
@@ -68,56 +139,79 @@ class ManualReader:
         if input.value == 1:  # Moving down
             if not self.in_section:
                 # Navegación normal en menús
-                if self.selected_position < (self.menu_len - 1):
-                    self.selected_position += 1
-                    if self.selected_position - self.scroll_offset >= self.visible_items:
-                        self.scroll_offset += 1
+                self.list.move(1)
+                self.list_only = True
             else:
                 # Scroll del contenido
                 self.content_scroll = min(self.content_scroll + 20, self.get_max_scroll())
         elif input.value == -1:  # Moving up
             if not self.in_section:
                 # Navegación normal en menús
-                if self.selected_position > 0:
-                    self.selected_position -= 1
-                    if self.selected_position < self.scroll_offset:
-                        self.scroll_offset -= 1
+                self.list.move(-1)
+                self.list_only = True
             else:
                 # Scroll del contenido
                 self.content_scroll = max(0, self.content_scroll - 20)
 
+    def _section_layout(self):
+        """Layout cacheado de la sección abierta"""
+        return self._layout(self.current_manual_path, self.current_manual_data, self.current_section)
+
+    def _layout(self, path, manual, section):
+        # El contenido solo se lee si el layout no está ya en la caché
+        width = self.content_box[2] - gr.scroll_padding * 2
+        return layout.section_layout(path, section, lambda: manual[section], width, getattr(manual, "stamp", None))
+
+    def _prefetch(self):
+        """
+        Prepara en segundo plano lo que abriría A sobre la selección y las
+        siguientes entradas: el manual en manual_cache o el layout de la
+        sección. Cambiar la selección cancela lo pendiente.
+        """
+        if self.in_search or self.in_section:
+            key = None
+        elif self.in_manual:
+            key = (self.current_manual_path, self.list.selected)
+        else:
+            key = (self.get_current_path(), self.list.selected)
+        if key == self._prefetch_key:
+            return
+        self._prefetch_key = key
+        if key is None:
+            self.prefetcher.cancel()
+            return
+
+        start = self.list.selected
+        tasks = []
+        if self.in_manual:
+            for section in list(self.current_manual_data.keys())[start:start + 1 + prefetch_ahead]:
+                tasks.append((self._layout, (self.current_manual_path, self.current_manual_data, section)))
+        else:
+            folder = os.path.join(self.manuals_root, *self.path_history)
+            for item in self.current_items[start:]:
+                if len(tasks) > prefetch_ahead:
+                    break
+                if item["type"] == "file":
+                    tasks.append((manual_cache.get, (os.path.join(folder, item["name"] + ".json"),)))
+        self.prefetcher.submit(tasks)
+
     def get_max_scroll(self):
         """Calcula el máximo scroll posible para el contenido actual"""
         if not self.in_section or not self.current_section:
             return 0
-            
-        content = self.current_manual_data[self.current_section]
-        
-        # Preparar el texto completo
-        display_text = f"{self.current_section}\n\n"
-        for step, description in content.items():
-            description = description.replace('\n', ' ').strip()
-            wrapped_step = textwrap.wrap(step, width=50)
-            wrapped_desc = textwrap.wrap(description, width=50)
-            display_text += "\n".join(wrapped_step) + "\n" + "\n".join(wrapped_desc) + "\n\n"
-        
-        # Calcular altura total del contenido
-        font_height = 20
-        total_lines = len(display_text.split('\n'))
-        total_height = total_lines * font_height
-        
-        # Altura visible del contenedor
-        visible_height = 340 - 20  # height - padding
-        
-        # Máximo scroll permitido
-        return max(0, total_height - visible_height)
+        return self._section_layout().max_scroll(self.content_box[3])
 
     def draw_menu(self):
+        self.frame_drawn = True
         gr.draw_clear()
         
         # Contenedor principal
-        gr.draw_rectangle_r([10, 40, 630, 440], 15, fill=gr.colorGrayD2, outline=None)
-        gr.draw_text((320, 20), "Manual Reader", anchor="mm")
+        widgets.container("Manual Reader")
+
+        if self.in_search:
+            self._draw_search()
+            gr.draw_paint()
+            return
         
         # Ruta actual
         current_path = self.get_current_path()
@@ -134,66 +228,28 @@ class ManualReader:
         # Botones
         button_circle((133, 440), "B", "Back")
         button_circle((320, 440), "A", "Select")
+        button_circle((507, 440), "X", "Search")
 
         gr.draw_paint()
 
     def _draw_directory_content(self):
-        start_idx = self.scroll_offset
-        end_idx = min(start_idx + self.visible_items, len(self.current_items))
-
-        if self.scroll_offset > 0:
-            gr.draw_text((320, 120), "▲", anchor="mm")
-        if end_idx < len(self.current_items):
-            gr.draw_text((320, 410), "▼", anchor="mm")
-
-        for i in range(start_idx, end_idx):
-            relative_pos = i - start_idx
-            y_pos = 130 + (relative_pos * 40)
-            item = self.current_items[i]
-            icon = "📁 " if item["type"] == "dir" else "📄 "
-            text = icon + item["name"]
-            row_list(text, (20, y_pos), 600, i == self.selected_position)
+        self.list.draw()
 
     def _draw_manual_sections(self):
-        sections = list(self.current_manual_data.keys())
-        self.menu_len = len(sections)
-        
-        start_idx = self.scroll_offset
-        end_idx = min(start_idx + self.visible_items, len(sections))
-
-        if self.scroll_offset > 0:
-            gr.draw_text((320, 120), "▲", anchor="mm")
-        if end_idx < len(sections):
-            gr.draw_text((320, 410), "▼", anchor="mm")
-
-        for i in range(start_idx, end_idx):
-            relative_pos = i - start_idx
-            y_pos = 130 + (relative_pos * 40)
-            text = sections[i]
-            row_list(text, (20, y_pos), 600, i == self.selected_position)
+        self.list.draw()
 
     def _draw_section_content(self):
         if not self.current_section or not self.current_manual_data:
             return
 
         try:
-            content = self.current_manual_data[self.current_section]
-            
-            # Preparar el contenido
-            display_text = f"{self.current_section}\n\n"
-            for step, description in content.items():
-                description = description.replace('\n', ' ').strip()
-                wrapped_step = textwrap.wrap(step, width=50)
-                wrapped_desc = textwrap.wrap(description, width=50)
-                display_text += "\n".join(wrapped_step) + "\n" + "\n".join(wrapped_desc) + "\n\n"
-
-            # Usar la nueva función de scroll
-            gr.draw_scrollable_text(
-                display_text,
-                x=20,
-                y=80,
-                width=600,
-                height=340,
+            x, y, width, height = self.content_box
+            gr.draw_scrollable_lines(
+                self._section_layout().lines,
+                x=x,
+                y=y,
+                width=width,
+                height=height,
                 scroll_offset=self.content_scroll,
                 fill=gr.colorBlue,
                 outline=gr.colorBlueD1
@@ -203,18 +259,147 @@ class ManualReader:
             print(f"Error drawing section content: {e}")
             gr.draw_log(f"Error: {str(e)}", fill=gr.colorBlue, outline=gr.colorBlueD1)
 
+    # Búsqueda
+
+    def _open_search(self):
+        self.in_search = True
+        self.search_on_results = False
+        self.search_key = (0, 0)
+        self._run_search()
+
+    def _run_search(self):
+        try:
+            index = self._open_index()
+            if index is not None:
+                self.search_results = index.search(self.search_query)
+            else:
+                self.search_results = manual_index.scan_search(self.manuals_root, self.search_query)
+        except sqlite3.Error as e:
+            print(f"Error searching manuals: {e}")
+            self.search_results = []
+        self.search_position = 0
+        self.search_scroll = 0
+        if not self.search_results:
+            self.search_on_results = False
+
+    def _result_text(self, result):
+        text = search_icons.get(result["kind"], "") + result["title"]
+        if result["kind"] == "section":
+            text += " · " + os.path.basename(result["path"])[:-5]
+        elif result["kind"] == "step":
+            text += " · " + result["section"]
+        return text
+
+    def _open_result(self, result):
+        """Navega al directorio, manual o sección del resultado"""
+        parts = result["path"].split(os.sep)
+        self.in_search = False
+        if result["kind"] == "dir":
+            self.path_history = parts
+            self.in_manual = False
+            self.in_section = False
+            self.current_manual_data = None
+            self._load_current_directory()
+            return
+
+        self.path_history = parts[:-1]
+        self._load_current_directory()
+        self._open_manual(os.path.join(self.manuals_root, result["path"]))
+        sections = list(self.current_manual_data.keys())
+        if result["section"] in sections:
+            self.list.select(sections.index(result["section"]))
+            self.current_section = result["section"]
+            self.in_section = True
+            self.content_scroll = 0
+            if result["kind"] == "step":
+                # Sitúa el paso arriba del todo si cabe
+                lines = self._section_layout().lines
+                first = gr.wrap_text(result["title"], self.content_box[2] - gr.scroll_padding * 2)[0]
+                if first in lines:
+                    self.content_scroll = min(
+                        lines.index(first) * gr.scroll_line_height, self.get_max_scroll()
+                    )
+
+    def _draw_search(self):
+        gr.draw_text((320, 60), "Search: " + self.search_query + "_", anchor="mm")
+
+        start_idx = self.search_scroll
+        end_idx = min(start_idx + search_visible_results, len(self.search_results))
+        if not self.search_results and self.search_query.strip():
+            gr.draw_text((320, 150), "No results", anchor="mm")
+        if self.indexing:
+            gr.draw_text((620, 20), "Indexing manuals...", font=13, anchor="rm")
+        for i in range(start_idx, end_idx):
+            y_pos = 80 + (i - start_idx) * 40
+            selected = self.search_on_results and i == self.search_position
+            row_list(self._result_text(self.search_results[i]), (20, y_pos), 600, selected)
+
+        row, col = self.search_key
+        for r, keys in enumerate(search_keys):
+            for c, char in enumerate(keys):
+                x = 40 + c * 56
+                y = 250 + r * 40
+                selected = not self.search_on_results and (r, c) == (row, col)
+                widgets.rounded_rectangle(
+                    [x, y, x + 50, y + 34],
+                    5,
+                    fill=(gr.colorBlue if selected else gr.colorGrayL1),
+                )
+                gr.draw_text((x + 25, y + 17), "SP" if char == " " else char, anchor="mm")
+
+        button_circle((40, 440), "B", "Back")
+        button_circle((190, 440), "A", "Type" if not self.search_on_results else "Open")
+        button_circle((340, 440), "Y", "Delete")
+        button_circle((490, 440), "S", "Results" if not self.search_on_results else "Keys")
+
+    def _handle_search_input(self):
+        if input.key("B"):
+            self.in_search = False
+        elif input.key("START"):
+            if self.search_results:
+                self.search_on_results = not self.search_on_results
+        elif input.key("Y"):
+            if self.search_query:
+                self.search_query = self.search_query[:-1]
+                self._run_search()
+        elif self.search_on_results:
+            if input.key("DY"):
+                position = max(0, min(len(self.search_results) - 1, self.search_position + input.value))
+                self.search_position = position
+                if position < self.search_scroll:
+                    self.search_scroll = position
+                elif position - self.search_scroll >= search_visible_results:
+                    self.search_scroll = position - search_visible_results + 1
+            elif input.key("A"):
+                self._open_result(self.search_results[self.search_position])
+        else:
+            row, col = self.search_key
+            if input.key("DY"):
+                row = (row + input.value) % len(search_keys)
+            elif input.key("DX"):
+                col = (col + input.value) % len(search_keys[row])
+            elif input.key("A"):
+                self.search_query += search_keys[row][col]
+                self._run_search()
+            self.search_key = (row, col)
+        return True
+
     def handle_input(self):
-        if input.key("DY"):
+        if self.in_search:
+            return self._handle_search_input()
+
+        if input.key("X"):
+            self._open_search()
+
+        elif input.key("DY"):
             self.move_cursor()
                 
         elif input.key("A"):
             if not self.in_manual and self.current_items:
-                selected_item = self.current_items[self.selected_position]
+                selected_item = self.current_items[self.list.selected]
                 
                 if selected_item["type"] == "dir":
                     self.path_history.append(selected_item["name"])
-                    self.selected_position = 0
-                    self.scroll_offset = 0
                     self._load_current_directory()
                 else:
                     json_path = os.path.join(
@@ -222,17 +407,12 @@ class ManualReader:
                         *self.path_history, 
                         f"{selected_item['name']}.json"
                     )
-                    self.current_manual_data = self._load_json(json_path)
-                    self.in_manual = True
-                    self.in_section = False
-                    self.current_section = None
-                    self.selected_position = 0
-                    self.scroll_offset = 0
+                    self._open_manual(json_path)
                     
             elif self.in_manual and not self.in_section:
                 sections = list(self.current_manual_data.keys())
-                if 0 <= self.selected_position < len(sections):
-                    self.current_section = sections[self.selected_position]
+                if 0 <= self.list.selected < len(sections):
+                    self.current_section = sections[self.list.selected]
                     self.in_section = True
                     self.content_scroll = 0
                 
@@ -244,40 +424,60 @@ class ManualReader:
             elif self.in_manual:
                 self.in_manual = False
                 self.current_manual_data = None
-                self.selected_position = 0
-                self.scroll_offset = 0
+                self._show_directory()
             elif self.path_history:
                 self.path_history.pop()
-                self.selected_position = 0
-                self.scroll_offset = 0
                 self._load_current_directory()
             else:
                 return False
                 
         return True
 
+    def _idle_timeout(self):
+        deadline = idle.deadline()
+        return None if deadline is None else max(0, deadline - time.monotonic())
+
     def update(self):
         continue_running = True
         
+        perf.frame_begin()
+        with perf.span("wait"):
+            # Mismo reposo que el bucle principal: al vencer el plazo se apaga
+            # la pantalla y se espera sin timeout
+            while True:
+                timeout = self._idle_timeout()
+                if input.poll(timeout):
+                    break
+                if timeout is None and not input.fds():
+                    # Sin dispositivos poll vuelve al instante y no llegará
+                    # ninguna tecla: dormir en vez de repintar sin parar
+                    time.sleep(1.0)
+                idle.check(time.monotonic())
+        idle.wakeup()
+        swallow = idle.touch()
         input.check()
-        
+        if swallow:
+            # La tecla que enciende la pantalla no se pasa al lector
+            perf.frame_end(False)
+            self.draw_menu()
+            return True
+
         if input.key("MENUF"):
             return False
 
-        continue_running = self.handle_input()
-        self.draw_menu()
+        self.list_only = False
+        if not perf.handle_input():
+            with perf.span("input"):
+                continue_running = self.handle_input()
+            self._prefetch()
+        with perf.span("draw"):
+            if self.list_only and self.frame_drawn:
+                # Solo cambió la selección: se pintan las filas afectadas
+                gr.draw_update()
+                self.list.paint()
+                gr.draw_paint()
+            else:
+                self.draw_menu()
+        perf.frame_end()
         
         return continue_running
-
-def row_list(text, pos, width, selected):
-    gr.draw_rectangle_r(
-        [pos[0], pos[1], pos[0] + width, pos[1] + 32],
-        5,
-        fill=(gr.colorBlue if selected else gr.colorGrayL1),
-    )
-    gr.draw_text((pos[0] + 5, pos[1] + 5), text)
-
-def button_circle(pos, button, text):
-    gr.draw_circle(pos, 25, fill=gr.colorBlueD1)
-    gr.draw_text((pos[0] + 12, pos[1] + 12), button, anchor="mm")
-    gr.draw_text((pos[0] + 30, pos[1] + 12), text, font=13, anchor="lm")
\ No newline at end of file
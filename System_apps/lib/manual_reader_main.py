@@ -9,16 +9,17 @@ if current_dir not in sys.path:
 from lib.manual_reader import ManualReader
 import lib.graphic as gr
 
+# Directorio raíz de los manuales
+manuals_root = os.path.join(current_dir, "manuals")
+
 def start_manual_reader():
     try:
-        # Especificar el directorio raíz de los manuales
-        manuals_root = os.path.join(current_dir, "manuals")
-        
         # Crear el directorio de manuales si no existe
         os.makedirs(manuals_root, exist_ok=True)
         
         # Inicializar el lector de manuales
         reader = ManualReader(manuals_root)
+        reader.draw_menu()
         
         # Main loop
         while True:
@@ -32,6 +33,7 @@ def start_manual_reader():
         
 if __name__ == "__main__":
     try:
+        gr.init()
         start_manual_reader()
     finally:
         gr.draw_end()
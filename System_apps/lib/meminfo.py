@@ -0,0 +1,64 @@
+"""
+Lectura de memoria directamente de /proc/meminfo.
+
+Sustituye a scripts/GetRAM.sh: sin fork/exec de free/awk y sin escribir
+en log.txt. sample() guarda lecturas en un buffer circular de tamaño fijo
+para poder mostrar la tendencia.
+"""
+import time
+from collections import deque
+
+meminfo_path = "/proc/meminfo"
+history_size = 60
+
+samples = deque(maxlen=history_size)  # (time.time(), info)
+
+
+def _parse(text):
+    fields = {}
+    for line in text.splitlines():
+        name, _, rest = line.partition(":")
+        parts = rest.split()
+        if parts:
+            fields[name] = int(parts[0])  # kB
+    return fields
+
+
+def read():
+    """Devuelve {total, used, available, usage_percent} en MB, como GetRAM.sh"""
+    try:
+        with open(meminfo_path, "r") as f:
+            fields = _parse(f.read())
+        total = fields["MemTotal"]
+        available = fields.get("MemAvailable")
+        if available is None:
+            # Kernels antiguos sin MemAvailable
+            available = fields.get("MemFree", 0) + fields.get("Buffers", 0) + fields.get("Cached", 0)
+        used = total - available
+        return {
+            "total": total // 1024,
+            "used": used // 1024,
+            "available": available // 1024,
+            "usage_percent": round(used * 100 / total, 1) if total else 0,
+        }
+    except Exception as e:
+        print(f"Error reading {meminfo_path}: {e}")
+        return {"total": 0, "used": 0, "available": 0, "usage_percent": 0}
+
+
+def sample():
+    """Toma una lectura y la añade al buffer circular"""
+    info = read()
+    samples.append((time.time(), info))
+    return info
+
+
+def set_history_size(size):
+    global samples, history_size
+    history_size = size
+    samples = deque(samples, maxlen=size)
+
+
+def usage_history():
+    """Porcentajes de uso de las lecturas guardadas, de la más antigua a la última"""
+    return [info["usage_percent"] for _, info in samples]
@@ -0,0 +1,146 @@
+"""
+Interfaces de red y sus direcciones sin lanzar procesos.
+
+La lista se obtiene con ioctls (SIOCGIFFLAGS, SIOCGIFADDR, SIOCGIFNETMASK)
+sobre un socket UDP y se guarda en caché. Un socket rtnetlink suscrito a
+los cambios de enlaces y direcciones IPv4 avisa cuando algo cambia (p. ej.
+al reconectar la Wi-Fi); su descriptor se añade al poll del bucle
+principal, así que mientras la red no cambie no cuesta nada.
+"""
+import fcntl
+import socket
+import struct
+import time
+
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891B
+IFF_UP = 0x1
+IFF_LOOPBACK = 0x8
+IFF_RUNNING = 0x40
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+
+max_age = 5.0  # Validez de la caché si no hay suscripción a rtnetlink
+
+_interfaces = None
+_probed_at = 0.0
+_netlink = None
+_ioctl_sock = None
+
+
+def _ioctl(name, request):
+    global _ioctl_sock
+    if _ioctl_sock is None:
+        _ioctl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    ifreq = struct.pack("16s16x", name.encode()[:15])
+    return fcntl.ioctl(_ioctl_sock.fileno(), request, ifreq)
+
+
+def _ipv4(name, request):
+    try:
+        return _ioctl(name, request)[20:24]
+    except OSError:
+        return None  # sin dirección asignada
+
+
+def _probe():
+    result = []
+    try:
+        names = socket.if_nameindex()
+    except OSError as e:
+        print(f"Error listing network interfaces: {e}")
+        return result
+    for _, name in names:
+        try:
+            flags = struct.unpack_from("H", _ioctl(name, SIOCGIFFLAGS), 16)[0]
+        except OSError:
+            continue  # desapareció mientras se recorría
+        address = _ipv4(name, SIOCGIFADDR)
+        netmask = _ipv4(name, SIOCGIFNETMASK)
+        result.append({
+            "name": name,
+            "up": bool(flags & IFF_UP),
+            "running": bool(flags & IFF_RUNNING),
+            "loopback": bool(flags & IFF_LOOPBACK),
+            "address": socket.inet_ntoa(address) if address else None,
+            "prefix": bin(int.from_bytes(netmask, "big")).count("1") if netmask else None,
+        })
+    return result
+
+
+def interfaces():
+    """Interfaces con estado y dirección IPv4, desde la caché si está al día"""
+    global _interfaces, _probed_at
+    now = time.monotonic()
+    if _interfaces is None or (_netlink is None and now - _probed_at > max_age):
+        _interfaces = _probe()
+        _probed_at = now
+    return _interfaces
+
+
+def invalidate():
+    global _interfaces
+    _interfaces = None
+
+
+def local_ip():
+    """Primera dirección de una interfaz activa que no sea loopback"""
+    for iface in interfaces():
+        if iface["address"] and iface["running"] and not iface["loopback"]:
+            return iface["address"]
+    return None
+
+
+def describe():
+    """Una línea por interfaz: nombre, estado y dirección"""
+    lines = []
+    for iface in interfaces():
+        if iface["loopback"]:
+            continue
+        state = "up" if iface["running"] else ("no link" if iface["up"] else "down")
+        address = f"{iface['address']}/{iface['prefix']}" if iface["address"] else "-"
+        lines.append(f"{iface['name']:<8} {state:<8} {address}")
+    return "\n".join(lines) or "No network interfaces"
+
+
+def watch():
+    """Suscribe a rtnetlink; devuelve el descriptor a vigilar o None"""
+    global _netlink
+    if _netlink is None:
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR))
+            sock.setblocking(False)
+        except (OSError, AttributeError) as e:
+            print(f"Network change notifications not available: {e}")
+            return None
+        _netlink = sock
+    return _netlink.fileno()
+
+
+def unwatch():
+    global _netlink
+    if _netlink is not None:
+        _netlink.close()
+        _netlink = None
+
+
+def handle_events():
+    """
+    Vacía los avisos pendientes del socket rtnetlink. Devuelve True si la
+    lista de interfaces cambió.
+    """
+    if _netlink is None:
+        return False
+    try:
+        while _netlink.recv(65536):
+            pass
+    except BlockingIOError:
+        pass
+    except OSError as e:
+        # ENOBUFS: se perdieron avisos; basta con volver a consultar
+        print(f"Error reading network notifications: {e}")
+    before = _interfaces
+    invalidate()
+    return interfaces() != before
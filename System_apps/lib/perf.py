@@ -0,0 +1,197 @@
+"""
+Instrumentación por frame y HUD de rendimiento.
+
+Los tramos con nombre (espera de entrada, sondeos de estado, dibujo,
+draw_paint...) se miden con ``with perf.span("nombre"):`` y se guardan por
+frame en un buffer circular. Desactivado, span() devuelve un objeto vacío
+compartido y solo cuesta una llamada.
+
+SELECT+START muestra u oculta el HUD; SELECT+X guarda las estadísticas en
+logs/. Con SYSTEMAPPS_PERF=1 se mide desde el arranque y con
+SYSTEMAPPS_PERF_DUMP=fichero se guardan al salir.
+"""
+import atexit
+import json
+import os
+import time
+from collections import deque
+
+import lib.graphic as gr
+import lib.idle as idle
+import lib.input as input
+import lib.manual_cache as manual_cache
+import lib.prefetch as prefetch
+import lib.widgets as widgets
+
+enabled = bool(os.environ.get("SYSTEMAPPS_PERF"))
+hud_visible = False
+history_size = 300  # frames guardados
+dump_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+
+frames = deque(maxlen=history_size)  # (instante, ms ocupado, {tramo: ms})
+_current = {}
+_frame_start = None
+_painted = 0  # gr.frames_painted al empezar el frame
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = (time.perf_counter() - self.start) * 1000
+        _current[self.name] = _current.get(self.name, 0.0) + elapsed
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_null = _NullSpan()
+_spans = {}
+
+
+def span(name):
+    """Contexto que suma su duración al tramo name del frame en curso"""
+    if not enabled:
+        return _null
+    s = _spans.get(name)
+    if s is None:
+        s = _spans[name] = _Span(name)
+    return s
+
+
+def frame_begin():
+    global _frame_start, _painted
+    if enabled:
+        _frame_start = time.perf_counter()
+        _painted = gr.frames_painted
+
+
+def frame_end(drawn=True):
+    """Cierra el frame; si no se dibujó nada se descarta lo medido"""
+    global _frame_start
+    if not enabled or _frame_start is None:
+        return
+    if drawn:
+        total = (time.perf_counter() - _frame_start) * 1000
+        if gr.frames_painted != _painted:
+            # draw_paint mide siempre su duración; es parte de "draw"
+            _current["paint"] = gr.paint_time * 1000
+        busy = total - _current.get("wait", 0.0)
+        frames.append((time.monotonic(), busy, dict(_current)))
+    _current.clear()
+    _frame_start = None
+
+
+def fps():
+    """Frames dibujados en el último segundo"""
+    if not frames:
+        return 0
+    now = time.monotonic()
+    return sum(1 for t, _, _ in frames if now - t <= 1.0)
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else 0.0
+
+
+def stats():
+    """Resumen por tramo (media, p50, p95, máximo en ms) de los frames guardados"""
+    names = sorted({name for _, _, spans in frames for name in spans})
+    summary = {}
+    for name in ["frame"] + names:
+        if name == "frame":
+            values = [busy for _, busy, _ in frames]
+        else:
+            values = [spans.get(name, 0.0) for _, _, spans in frames]
+        summary[name] = {
+            "mean_ms": round(sum(values) / len(values), 3) if values else 0,
+            "p50_ms": round(_percentile(values, 50), 3),
+            "p95_ms": round(_percentile(values, 95), 3),
+            "max_ms": round(max(values), 3) if values else 0,
+        }
+    return {
+        "frames": len(frames),
+        "fps": fps(),
+        "spans": summary,
+        "paint": gr.paint_stats(),
+        "text_cache": gr.text_cache_stats(),
+        "sprite_cache": widgets.sprite_cache_stats(),
+        "idle": idle.stats(),
+        "manual_cache": manual_cache.stats(),
+        "prefetch": prefetch.stats(),
+    }
+
+
+def dump(path=None):
+    """Guarda stats() y los frames en JSON; devuelve la ruta"""
+    if path is None:
+        os.makedirs(dump_dir, exist_ok=True)
+        path = os.path.join(dump_dir, time.strftime("perf-%Y%m%d-%H%M%S.json"))
+    data = stats()
+    data["history"] = [{"busy_ms": round(busy, 3), "spans": spans} for _, busy, spans in frames]
+    try:
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"Performance stats saved to {path}")
+    except OSError as e:
+        print(f"Error saving performance stats: {e}")
+    return path
+
+
+def set_hud(visible):
+    global enabled, hud_visible
+    hud_visible = visible
+    if visible:
+        enabled = True
+    gr.overlay = draw_hud if visible else None
+
+
+def handle_input():
+    """Atajos con SELECT mantenido; True si la tecla era para el HUD"""
+    if not input.held("SELECT"):
+        return False
+    if input.key("START"):
+        set_hud(not hud_visible)
+        return True
+    if input.key("X"):
+        dump()
+        return True
+    return False
+
+
+def draw_hud():
+    """Recuadro con FPS, tiempo de frame y desglose del último segundo"""
+    now = time.monotonic()
+    recent = [(busy, spans) for t, busy, spans in frames if now - t <= 1.0]
+    lines = [f"FPS {len(recent):3d}"]
+    if recent:
+        lines[0] += f"  frame {sum(b for b, _ in recent) / len(recent):5.1f} ms"
+        totals = {}
+        for _, spans in recent:
+            for name, ms in spans.items():
+                totals[name] = totals.get(name, 0.0) + ms
+        for name, ms in sorted(totals.items(), key=lambda item: -item[1])[:5]:
+            lines.append(f"{name:<8} {ms / len(recent):6.2f} ms")
+    height = 8 + len(lines) * 16
+    gr.draw_rectangle([4, 4, 214, 4 + height], fill="black", outline=gr.colorBlue)
+    for i, line in enumerate(lines):
+        gr.draw_text((10, 8 + i * 16), line, font=13, color="yellow")
+
+
+if os.environ.get("SYSTEMAPPS_PERF_DUMP"):
+    enabled = True
+    atexit.register(dump, os.environ["SYSTEMAPPS_PERF_DUMP"])
@@ -0,0 +1,93 @@
+"""
+Trabajo especulativo en segundo plano.
+
+Un único hilo ejecuta tareas de una cola acotada. Cada submit() sustituye
+las tareas pendientes por las nuevas y sube el contador de generación; el
+hilo descarta cualquier tarea de una generación anterior, así que mover el
+cursor cancela lo que ya no hace falta. La tarea en curso no se
+interrumpe, pero su resultado sigue siendo válido para las cachés.
+
+Cada tarea espera delay segundos desde su submit() antes de empezar: al
+mantener pulsada una dirección el cursor pasa por muchas entradas y solo
+se precarga alrededor de donde se detiene.
+"""
+import queue
+import threading
+import time
+
+queue_size = 4  # tareas pendientes como máximo
+delay = 0.15  # segundos sin nuevos submit() antes de empezar
+
+
+class Prefetcher(threading.Thread):
+    def __init__(self, maxsize=queue_size, delay=delay):
+        super().__init__(name="prefetch", daemon=True)
+        self.queue = queue.Queue(maxsize)
+        self.delay = delay
+        self.generation = 0
+        self.done = 0
+        self.cancelled = 0  # tareas descartadas por obsoletas
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def submit(self, tasks):
+        """Sustituye lo pendiente por tasks, una lista de (función, args)"""
+        with self._lock:
+            self.generation += 1
+            self._drain()
+            submitted = time.monotonic()
+            for func, args in tasks[:self.queue.maxsize]:
+                self.queue.put_nowait((self.generation, submitted, func, args))
+
+    def cancel(self):
+        with self._lock:
+            self.generation += 1
+            self._drain()
+
+    def _drain(self):
+        try:
+            while True:
+                self.queue.get_nowait()
+                self.cancelled += 1
+        except queue.Empty:
+            pass
+
+    def run(self):
+        while True:
+            generation, submitted, func, args = self.queue.get()
+            wait = submitted + self.delay - time.monotonic()
+            if wait > 0 and generation == self.generation:
+                time.sleep(wait)
+            if generation != self.generation:
+                self.cancelled += 1
+                continue
+            try:
+                func(*args)
+                self.done += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error prefetching {getattr(func, '__name__', func)}{args}: {e}")
+
+    def stats(self):
+        return {
+            "done": self.done,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "pending": self.queue.qsize(),
+        }
+
+
+worker = None
+
+
+def start():
+    """Arranca el hilo compartido (una sola vez)"""
+    global worker
+    if worker is None:
+        worker = Prefetcher()
+        worker.start()
+    return worker
+
+
+def stats():
+    return worker.stats() if worker is not None else {}
@@ -0,0 +1,166 @@
+"""
+Planificador del bucle principal.
+
+Cada iteración espera en un único select a que haya entrada, a que venza
+un temporizador (tareas periódicas, repetición de teclas) o a que toque
+el siguiente frame, y solo redibuja si algo marcó la pantalla como sucia.
+En reposo (lib.idle) no hay tareas ni dibujo y el select no tiene timeout.
+"""
+import os
+import select
+import time
+
+import lib.idle as idle
+import lib.input as input
+import lib.perf as perf
+
+frame_budget = 1 / 30  # Tiempo mínimo entre dos frames
+
+_tasks = []
+_readers = {}  # fd -> callback
+_dirty = True
+_last_frame = 0.0
+_wake_fds = os.pipe()  # self-pipe de wake()
+for _fd in _wake_fds:
+    os.set_blocking(_fd, False)
+
+
+class Task:
+    def __init__(self, name, interval, callback, next_run):
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.next_run = next_run
+
+
+def add_task(name, interval, callback, delay=None):
+    """Registra callback para ejecutarse cada interval segundos"""
+    now = time.monotonic()
+    task = Task(name, interval, callback, now + (interval if delay is None else delay))
+    _tasks.append(task)
+    return task
+
+
+def remove_task(task):
+    if task in _tasks:
+        _tasks.remove(task)
+
+
+def get_task(name):
+    for task in _tasks:
+        if task.name == name:
+            return task
+    return None
+
+
+def add_reader(fd, callback):
+    """Incluye fd en el poll; callback() se llama cuando sea legible"""
+    _readers[fd] = callback
+
+
+def remove_reader(fd):
+    _readers.pop(fd, None)
+
+
+def mark_dirty():
+    global _dirty
+    _dirty = True
+
+
+def _drain_wake():
+    try:
+        while os.read(_wake_fds[0], 64):
+            pass
+    except BlockingIOError:
+        pass
+
+
+def wake():
+    """Despierta el poll desde otro hilo (p. ej. tras mark_dirty)"""
+    try:
+        os.write(_wake_fds[1], b"\0")
+    except BlockingIOError:
+        pass  # ya hay un aviso pendiente
+
+
+def is_dirty():
+    return _dirty
+
+
+add_reader(_wake_fds[0], _drain_wake)
+
+
+def _next_timeout(now):
+    deadlines = [task.next_run for task in _tasks]
+    repeat_at = input.next_deadline()
+    if repeat_at is not None:
+        deadlines.append(repeat_at)
+    if _dirty:
+        deadlines.append(_last_frame + frame_budget)
+    idle_at = idle.deadline()
+    if idle_at is not None:
+        deadlines.append(idle_at)
+    if not deadlines:
+        return None
+    return max(0, min(deadlines) - now)
+
+
+def _run_tasks(now):
+    for task in list(_tasks):
+        if task.next_run > now:
+            continue
+        task.next_run += task.interval
+        if task.next_run <= now:
+            task.next_run = now + task.interval
+        try:
+            task.callback()
+        except Exception as e:
+            print(f"Error in task {task.name}: {e}")
+
+
+def run_once(on_input, on_draw):
+    """Una iteración: esperar, despachar entrada, tareas y dibujar si hace falta"""
+    global _dirty, _last_frame
+
+    perf.frame_begin()
+    if not input.queue:
+        input_fds = input.fds()
+        sleeping = idle.check(time.monotonic())
+        timeout = None if sleeping else _next_timeout(time.monotonic())
+        with perf.span("wait"):
+            ready, _, _ = select.select(input_fds + list(_readers), [], [], timeout)
+        idle.wakeup()
+        input.pump([fd for fd in ready if fd in input_fds])
+        for fd in ready:
+            callback = _readers.get(fd)
+            if callback:
+                callback()
+
+    # La tecla que enciende la pantalla no se pasa a la aplicación
+    handled = bool(input.queue)
+    swallow = handled and idle.touch()
+    with perf.span("input"):
+        while input.queue:
+            input.apply(input.queue.popleft())
+            if not swallow:
+                on_input()
+    if handled:
+        # on_input puede haber abierto otro bucle (el lector de manuales):
+        # el plazo de reposo cuenta desde que vuelve
+        idle.touch()
+
+    if idle.idle:
+        perf.frame_end(False)
+        return
+
+    now = time.monotonic()
+    with perf.span("tasks"):
+        _run_tasks(now)
+
+    drawn = _dirty and now - _last_frame >= frame_budget
+    if drawn:
+        _dirty = False
+        _last_frame = now
+        with perf.span("draw"):
+            on_draw()
+    perf.frame_end(drawn)
@@ -0,0 +1,121 @@
+"""
+Estado cacheado de los servicios SSH/SCP.
+
+La vida de sshd se deduce de su pidfile y de /proc en lugar de lanzar
+``systemctl``. El resultado se guarda hasta que uno de nuestros scripts
+cambia el servicio (``invalidate()``) o hasta que el pidfile o el
+sshd_config cambian en disco (mtime, tamaño, inodo), así que dibujar el
+menú no crea ningún subproceso.
+"""
+import os
+
+import lib.sshd_config as sshd_config
+
+pid_file = "/run/sshd.pid"
+config_file = "/etc/ssh/sshd_config"
+proc_root = "/proc"
+
+_signature = None
+_pid = 0
+_ssh_active = False
+_scp_config = False
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _is_sshd(pid):
+    try:
+        with open(os.path.join(proc_root, str(pid), "comm"), "r") as f:
+            return f.read().strip() == "sshd"
+    except OSError:
+        return False
+
+
+def _is_listener(pid):
+    """
+    El sshd que escucha es hijo de init (o de systemd); los de cada sesión
+    cuelgan de él y no indican que el servicio esté activo.
+    """
+    try:
+        with open(os.path.join(proc_root, str(pid), "status"), "r") as f:
+            for line in f:
+                if line.startswith("PPid:"):
+                    return int(line.split()[1]) == 1
+    except (OSError, ValueError, IndexError):
+        pass
+    return False
+
+
+def _find_sshd_pid():
+    """Busca el pid de sshd, primero en el pidfile y luego en /proc"""
+    try:
+        with open(pid_file, "r") as f:
+            pid = int(f.read().strip() or 0)
+        if pid and _is_sshd(pid):
+            return pid
+    except (OSError, ValueError):
+        pass
+
+    # Sin pidfile válido: recorrer /proc una sola vez
+    try:
+        for entry in os.scandir(proc_root):
+            if entry.name.isdigit() and _is_sshd(entry.name) and _is_listener(entry.name):
+                return int(entry.name)
+    except OSError:
+        pass
+    return 0
+
+
+def _scp_config_enabled():
+    return sshd_config.load(config_file).forwarding_enabled()
+
+
+def _refresh(signature):
+    global _signature, _pid, _ssh_active, _scp_config
+    _pid = _find_sshd_pid()
+    _ssh_active = _pid != 0
+    _scp_config = _scp_config_enabled()
+    _signature = signature
+
+
+def _check():
+    signature = (_stat_key(pid_file), _stat_key(config_file))
+    if signature != _signature:
+        _refresh(signature)
+    elif _pid and not os.path.exists(os.path.join(proc_root, str(_pid))):
+        # sshd murió sin borrar su pidfile
+        _refresh(signature)
+
+
+def invalidate():
+    """Fuerza una nueva lectura en la siguiente consulta"""
+    global _signature
+    _signature = None
+
+
+def ssh_active():
+    _check()
+    return _ssh_active
+
+
+def scp_configured():
+    """True si sshd_config permite el reenvío TCP que usa SCP"""
+    _check()
+    return _scp_config
+
+
+def scp_active():
+    _check()
+    return _ssh_active and _scp_config
+
+
+def status():
+    """Devuelve (ssh_active, scp_active) con una única validación"""
+    _check()
+    return _ssh_active, _ssh_active and _scp_config
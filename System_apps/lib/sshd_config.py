@@ -0,0 +1,228 @@
+"""
+Modelo de /etc/ssh/sshd_config.
+
+El fichero se lee y se separa en directivas una sola vez, y solo se
+vuelve a leer cuando cambia su (mtime, tamaño, inodo). Las consultas
+(¿está permitido el reenvío TCP que usa SCP?) se responden desde memoria.
+Los cambios editan únicamente las líneas de las directivas afectadas,
+conservando comentarios y cualquier otra edición del usuario, y se
+escriben de forma atómica: fichero temporal, fsync y rename.
+
+Solo se tienen en cuenta las directivas globales, las anteriores al
+primer bloque Match. Los Include no se siguen.
+
+    python3 lib/sshd_config.py enable-scp
+    python3 lib/sshd_config.py --file /tmp/sshd_config get AllowTcpForwarding
+"""
+import os
+import re
+import sys
+import tempfile
+
+config_file = "/etc/ssh/sshd_config"
+
+# Directivas que dejaban los scripts EnableSSH.sh / EnableSCP.sh / DisableSCP.sh
+SSH_DIRECTIVES = (
+    ("Port", "22"),
+    ("PermitRootLogin", "yes"),
+    ("StrictModes", "no"),
+    ("PasswordAuthentication", "yes"),
+    ("ChallengeResponseAuthentication", "no"),
+    ("UsePAM", "yes"),
+    ("PrintMotd", "no"),
+    ("UseDNS", "no"),
+    ("AcceptEnv", "LANG LC_*"),
+    ("Subsystem", "sftp /usr/lib/openssh/sftp-server"),
+)
+SCP_ENABLED = (("AllowTcpForwarding", "yes"), ("X11Forwarding", "no"))
+SCP_DISABLED = (("AllowTcpForwarding", "no"), ("X11Forwarding", "no"))
+
+_directive_re = re.compile(r"^\s*([A-Za-z][A-Za-z0-9]*)(?:\s*=\s*|\s+)(.*?)\s*$")
+_commented_re = re.compile(r"^\s*#\s*([A-Za-z][A-Za-z0-9]*)[\s=]")
+
+_configs = {}  # ruta -> SshdConfig
+
+
+def _identity(keyword, value):
+    """
+    Qué línea sustituye una directiva. AcceptEnv se acumula, así que solo
+    coincide con el mismo valor; Subsystem se identifica por su nombre.
+    """
+    keyword = keyword.lower()
+    if keyword == "acceptenv":
+        return keyword, " ".join(value.split())
+    if keyword == "subsystem":
+        return keyword, (value.split() or [""])[0]
+    return (keyword,)
+
+
+class SshdConfig:
+    def __init__(self, path):
+        self.path = path
+        self.lines = []
+        self.loads = 0  # lecturas del disco, para comprobar la caché
+        self._stamp = False  # False: nunca leído; None: no existe
+        self._directives = []  # (índice de línea, palabra clave, valor) globales
+        self._match_start = 0  # primera línea Match (o len(lines))
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def refresh(self):
+        """Relee el fichero si cambió en disco; True si se leyó"""
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return False
+        try:
+            with open(self.path, "r") as f:
+                self.lines = f.read().splitlines()
+        except FileNotFoundError:
+            self.lines = []
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Error reading {self.path}: {e}")
+            self.lines = []
+        self._stamp = stamp
+        self.loads += 1
+        self._parse()
+        return True
+
+    def _parse(self):
+        self._directives = []
+        self._match_start = len(self.lines)
+        for i, line in enumerate(self.lines):
+            if line.lstrip().startswith("#"):
+                continue
+            m = _directive_re.match(line)
+            if not m:
+                continue
+            keyword = m.group(1).lower()
+            if keyword == "match":
+                self._match_start = i
+                break
+            self._directives.append((i, keyword, m.group(2)))
+
+    def get(self, keyword, default=None):
+        """Valor efectivo: en sshd gana la primera aparición"""
+        self.refresh()
+        keyword = keyword.lower()
+        for _, name, value in self._directives:
+            if name == keyword:
+                return value
+        return default
+
+    def forwarding_enabled(self):
+        """True si AllowTcpForwarding está puesto explícitamente a yes/all"""
+        return (self.get("AllowTcpForwarding") or "").lower() in ("yes", "all")
+
+    def set(self, keyword, value):
+        """Cambia o añade la directiva en memoria; True si hubo cambios"""
+        self.refresh()
+        identity = _identity(keyword, value)
+        line = f"{keyword} {value}"
+        for i, name, current in self._directives:
+            if _identity(name, current) == identity:
+                if current.split() == value.split():
+                    return False
+                self.lines[i] = line
+                self._parse()
+                return True
+
+        # Nueva: tras su ejemplo comentado si lo hay (#PermitRootLogin ...),
+        # si no antes del primer Match o al final
+        position = self._match_start
+        while position > 0 and not self.lines[position - 1].strip():
+            position -= 1
+        for i in range(self._match_start):
+            m = _commented_re.match(self.lines[i])
+            if m and m.group(1).lower() == identity[0]:
+                position = i + 1
+                break
+        self.lines.insert(position, line)
+        self._parse()
+        return True
+
+    def apply(self, directives):
+        """Aplica (palabra clave, valor) y guarda si algo cambió; True si cambió"""
+        changed = False
+        for keyword, value in directives:
+            changed = self.set(keyword, value) or changed
+        if changed:
+            self.save()
+        return changed
+
+    def save(self):
+        """Escritura atómica: temporal en el mismo directorio, fsync y rename"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            mode = os.stat(self.path).st_mode & 0o7777
+        except OSError:
+            mode = 0o644
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(self.path) + ".")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write("\n".join(self.lines) + "\n")
+                f.flush()
+                os.fchmod(f.fileno(), mode)
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self._stamp = self._stat()
+
+
+def load(path=None):
+    """SshdConfig compartido para path, al día con el disco"""
+    path = path or config_file
+    config = _configs.get(path)
+    if config is None:
+        config = _configs[path] = SshdConfig(path)
+    config.refresh()
+    return config
+
+
+def enable_ssh(path=None):
+    return load(path).apply(SSH_DIRECTIVES)
+
+
+def enable_scp(path=None):
+    return load(path).apply(SSH_DIRECTIVES + SCP_ENABLED)
+
+
+def disable_scp(path=None):
+    return load(path).apply(SSH_DIRECTIVES + SCP_DISABLED)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Edit sshd_config in place")
+    parser.add_argument("--file", default=config_file)
+    parser.add_argument("command", choices=("enable-ssh", "enable-scp", "disable-scp", "get"))
+    parser.add_argument("keyword", nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "get":
+        value = load(args.file).get(args.keyword or "")
+        if value is None:
+            return 1
+        print(value)
+        return 0
+    changed = {"enable-ssh": enable_ssh, "enable-scp": enable_scp, "disable-scp": disable_scp}[args.command](args.file)
+    print(f"{args.file}: {'updated' if changed else 'unchanged'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
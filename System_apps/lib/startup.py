@@ -0,0 +1,94 @@
+"""
+Medición del arranque.
+
+Siempre se mide el tiempo desde que arrancó el proceso hasta el primer
+frame. Con SYSTEMAPPS_IMPORTTIME=1 además se instala un finder que mide
+cada importación, con tiempo propio y acumulado por módulo como hace
+``python -X importtime``, y se imprime el desglose en el log.
+"""
+import os
+import sys
+import time
+
+_t0 = time.perf_counter()
+records = []  # (módulo, propio, acumulado, profundidad) en segundos
+_stack = []
+_finder = None
+_reported = False
+
+
+class _TimedLoader:
+    def __init__(self, loader):
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        _stack.append(0.0)
+        try:
+            self.loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = _stack.pop()
+            if _stack:
+                _stack[-1] += elapsed
+            records.append((module.__name__, elapsed - children, elapsed, len(_stack)))
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class _TimingFinder:
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader)
+            return spec
+        return None
+
+
+def install():
+    """Empieza a medir las importaciones si SYSTEMAPPS_IMPORTTIME está activo"""
+    global _finder
+    if _finder is None and os.environ.get("SYSTEMAPPS_IMPORTTIME"):
+        _finder = _TimingFinder()
+        sys.meta_path.insert(0, _finder)
+
+
+def process_age():
+    """Segundos desde que el kernel creó el proceso (incluye arrancar Python)"""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # El campo 22 es starttime; comm puede contener espacios
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def first_frame(top=15):
+    """Informa del tiempo hasta el primer frame y, si se midió, de las importaciones"""
+    global _reported, _finder
+    if _reported:
+        return
+    _reported = True
+    since_import = time.perf_counter() - _t0
+    age = process_age()
+    launch = f"{age * 1000:.0f} ms" if age is not None else "N/A"
+    print(f"Launch to first frame: {launch} (main.py to first frame: {since_import * 1000:.0f} ms)")
+
+    if _finder is not None:
+        sys.meta_path.remove(_finder)
+        _finder = None
+        print("import time:  self [us] | cumulative | imported package")
+        for name, own, total, depth in sorted(records, key=lambda r: r[2], reverse=True)[:top]:
+            print(f"import time: {own * 1e6:9.0f} | {total * 1e6:10.0f} | {'  ' * depth}{name}")
@@ -0,0 +1,224 @@
+"""
+Grabación y reproducción de la entrada para medir latencias.
+
+Una traza es una cabecera seguida de los eventos evdev tal cual llegan del
+kernel (registros de input.EVENT_FORMAT, con su marca de tiempo). La
+reproducción escribe esos registros en una tubería que input lee como un
+dispositivo más, respetando los intervalos grabados (o acelerados), y mide
+para cada evento el tiempo desde que se leyó hasta que su frame llegó a la
+pantalla.
+
+    SYSTEMAPPS_TRACE=/tmp/sesion.trace  graba la sesión de app.start()
+    python3 benchmark.py --replay /tmp/sesion.trace --speed 4
+"""
+import atexit
+import fcntl
+import os
+import struct
+import termios
+import threading
+import time
+
+import lib.graphic as gr
+import lib.input as input
+
+MAGIC = b"SATRACE1"
+HEADER_FORMAT = "<8sHHd"  # magic, versión, tamaño de evento, hora de inicio
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+VERSION = 1
+settle_timeout = 2.0  # espera máxima a que se pinte lo reproducido antes de salir
+
+_recorder = None
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, input.EVENT_SIZE, time.time()))
+        self.events = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.events += len(data) // input.EVENT_SIZE
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            print(f"Input trace saved to {self.path} ({self.events} events)")
+
+
+def record(path):
+    """Empieza a grabar en path todo lo que se lea de los dispositivos"""
+    global _recorder
+    stop_recording()
+    try:
+        _recorder = Recorder(path)
+    except OSError as e:
+        print(f"Error opening input trace {path}: {e}")
+        return None
+    input.recorder = _recorder.write
+    atexit.register(stop_recording)
+    return _recorder
+
+
+def stop_recording():
+    global _recorder
+    input.recorder = None
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def load(path):
+    """Devuelve [(segundos desde el primer evento, registro crudo)]"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, event_size, _ = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not an input trace")
+    if event_size != input.EVENT_SIZE:
+        raise ValueError(f"{path} was recorded with {event_size}-byte events, expected {input.EVENT_SIZE}")
+
+    events = []
+    first = None
+    for offset in range(HEADER_SIZE, len(data) - event_size + 1, event_size):
+        raw = data[offset:offset + event_size]
+        tv_sec, tv_usec, _, _, _ = struct.unpack(input.EVENT_FORMAT, raw)
+        stamp = tv_sec + tv_usec / 1e6
+        if first is None:
+            first = stamp
+        events.append((stamp - first, raw))
+    return events
+
+
+class Replay(threading.Thread):
+    """Escribe los eventos de una traza en una tubería registrada en input"""
+
+    def __init__(self, events, speed=1.0):
+        super().__init__(daemon=True)
+        self.events = list(events)
+        self.speed = speed  # 0: sin esperas
+        self.finished = threading.Event()
+        self.written = threading.Event()  # ya se escribió toda la traza
+        self.settled = threading.Event()  # ... y se pintó
+        self._stopping = threading.Event()
+        self.read_fd, self._write_fd = os.pipe()
+        input.add_fd(self.read_fd, "trace replay")
+        self.exit_events = self._exit_events()
+
+    def _exit_events(self):
+        """
+        Termina con MENUF para salir de la aplicación aunque la grabación
+        acabe en otra pantalla (p. ej. en el lector de manuales, donde
+        MENUF solo vuelve al menú)
+        """
+        menuf = next(code for code, name in input.mapping.items() if name == "MENUF")
+        last = self.events[-1][0] if self.events else 0.0
+        return [(last + 0.5, struct.pack(input.EVENT_FORMAT, 0, 0, input.EV_KEY, menuf, value)) for value in (1, 0)]
+
+    def _write(self, start, events):
+        """Escribe events respetando sus tiempos; False si se pidió parar"""
+        for offset, raw in events:
+            if self.speed:
+                delay = start + offset / self.speed - time.monotonic()
+                if delay > 0 and self._stopping.wait(delay):
+                    return False
+            # La marca de tiempo pasa a ser la de ahora, como haría el kernel
+            now = time.time()
+            _, _, etype, code, value = struct.unpack(input.EVENT_FORMAT, raw)
+            os.write(self._write_fd, struct.pack(input.EVENT_FORMAT, int(now), int(now % 1 * 1e6), etype, code, value))
+        return True
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            if self._write(start, self.events):
+                self.written.set()
+                # Sin esperas (speed 0) MENUF llegaría en la misma lectura que
+                # los últimos eventos y la aplicación saldría sin pintarlos
+                self.settled.wait(settle_timeout)
+                self._write(start, self.exit_events)
+        finally:
+            os.close(self._write_fd)
+            self.finished.set()
+
+    def on_paint(self):
+        """Tras cada frame (en el hilo principal): ¿queda algo sin pintar?"""
+        if self.written.is_set() and not input.queue and not self._unread():
+            self.settled.set()
+
+    def _unread(self):
+        """Bytes escritos en la tubería que input aún no ha leído"""
+        try:
+            return struct.unpack("i", fcntl.ioctl(self.read_fd, termios.FIONREAD, b"\0" * 4))[0]
+        except OSError:
+            return 0
+
+    def stop(self):
+        self._stopping.set()
+        self.settled.set()
+
+
+class LatencyMeter:
+    """Latencia entrada -> pantalla de cada evento publicado con input.apply()"""
+
+    def __init__(self, on_paint=None):
+        self.pending = []  # Event.time de eventos aún sin pintar
+        self.latencies = []  # ms
+        self.on_paint = on_paint  # llamada tras contabilizar cada frame
+
+    def install(self):
+        input.listener = self._on_event
+        gr.after_paint = self._on_paint
+
+    def uninstall(self):
+        input.listener = None
+        gr.after_paint = None
+
+    def _on_event(self, event):
+        self.pending.append(event.time)
+
+    def _on_paint(self):
+        now = time.monotonic()
+        self.latencies.extend((now - t) * 1000 for t in self.pending)
+        self.pending.clear()
+        if self.on_paint:
+            self.on_paint()
+
+    def summary(self):
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3) if ordered else 0
+
+        return {
+            "events": len(ordered),
+            "unpainted": len(self.pending),
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "max_ms": round(ordered[-1], 3) if ordered else 0,
+        }
+
+
+def replay(path, update, speed=1.0):
+    """
+    Reproduce la traza llamando a update() (app.update) hasta que termina.
+
+    Devuelve el resumen de LatencyMeter. MENUF sale de la aplicación con
+    sys.exit(), que aquí marca el final de la reproducción.
+    """
+    source = Replay(load(path), speed)
+    meter = LatencyMeter(on_paint=source.on_paint)
+    meter.install()
+    source.start()
+    try:
+        while not (source.finished.is_set() and source.read_fd not in input.fds() and not input.queue):
+            update()
+    except SystemExit:
+        pass
+    finally:
+        source.stop()
+        meter.uninstall()
+    return meter.summary()
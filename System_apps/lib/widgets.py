@@ -0,0 +1,237 @@
+"""
+Widgets compartidos por el menú principal y el lector de manuales.
+
+Cada forma (rectángulo redondeado, círculo) se rasteriza una sola vez por
+(forma, tamaño, color) en un sprite RGBA y después solo se pega en el
+lienzo, así que un frame del menú se reduce a unos pocos paste.
+
+VirtualList mantiene las filas visibles de una lista ya dibujadas en una
+superficie propia: cambiar la selección vuelve a pintar dos filas y
+desplazarse una fila mueve los píxeles con un memmove y pinta solo la
+que aparece, tenga la lista 10 o 10000 elementos.
+"""
+import ctypes
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw
+
+import lib.graphic as gr
+
+sprite_cache = OrderedDict()
+sprite_cache_limit = 4 * 1024 * 1024  # bytes
+sprite_cache_bytes = 0
+sprite_cache_hits = 0
+sprite_cache_misses = 0
+
+
+def _sprite(shape, size, radius, fill, outline):
+    global sprite_cache_bytes, sprite_cache_hits, sprite_cache_misses
+    key = (shape, size, radius, fill, outline)
+    sprite = sprite_cache.get(key)
+    if sprite is not None:
+        sprite_cache.move_to_end(key)
+        sprite_cache_hits += 1
+        return sprite
+
+    sprite_cache_misses += 1
+    sprite = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    box = [0, 0, size[0] - 1, size[1] - 1]
+    fill = gr.native_color(fill)
+    outline = gr.native_color(outline)
+    if shape == "rounded_rectangle":
+        draw.rounded_rectangle(box, radius, fill=fill, outline=outline)
+    else:
+        draw.ellipse(box, fill=fill, outline=outline)
+
+    sprite_cache[key] = sprite
+    sprite_cache_bytes += size[0] * size[1] * 4
+    while sprite_cache_bytes > sprite_cache_limit and len(sprite_cache) > 1:
+        _, old = sprite_cache.popitem(last=False)
+        sprite_cache_bytes -= old.size[0] * old.size[1] * 4
+    return sprite
+
+
+def sprite_cache_stats():
+    total = sprite_cache_hits + sprite_cache_misses
+    return {
+        "hits": sprite_cache_hits,
+        "misses": sprite_cache_misses,
+        "hit_rate": round(sprite_cache_hits / total, 3) if total else 0,
+        "entries": len(sprite_cache),
+        "bytes": sprite_cache_bytes,
+    }
+
+
+def rounded_rectangle(position, radius, fill=None, outline=None):
+    x0, y0, x1, y1 = (int(v) for v in position)
+    sprite = _sprite("rounded_rectangle", (x1 - x0 + 1, y1 - y0 + 1), radius, fill, outline)
+    gr.draw_sprite(sprite, (x0, y0))
+
+
+def circle(position, radius, fill=None, outline="white"):
+    sprite = _sprite("ellipse", (radius + 1, radius + 1), 0, fill, outline)
+    gr.draw_sprite(sprite, (int(position[0]), int(position[1])))
+
+
+def container(title):
+    """Contenedor principal y título de pantalla"""
+    rounded_rectangle([10, 40, 630, 440], 15, fill=gr.colorGrayD2, outline=None)
+    gr.draw_text((320, 20), title, anchor="mm")
+
+
+def row_list(text, pos, width, selected):
+    rounded_rectangle(
+        [pos[0], pos[1], pos[0] + width, pos[1] + 32],
+        5,
+        fill=(gr.colorBlue if selected else gr.colorGrayL1),
+    )
+    gr.draw_text((pos[0] + 5, pos[1] + 5), text)
+
+
+def button_circle(pos, button, text):
+    circle(pos, 25, fill=gr.colorBlueD1)
+    gr.draw_text((pos[0] + 12, pos[1] + 12), button, anchor="mm")
+    gr.draw_text((pos[0] + 30, pos[1] + 12), text, font=13, anchor="lm")
+
+
+class VirtualList:
+    """Lista con scroll de filas como las de row_list()"""
+
+    def __init__(self, position, width, height, pitch=40, row_height=32, background=gr.colorGrayD2):
+        self.x, self.y = position
+        self.width = width
+        self.pitch = pitch
+        self.row_height = row_height
+        self.background = background
+        self.visible = max(1, height // pitch)
+        self.items = []
+        self.selected = 0
+        self.offset = 0
+        self.surface = gr.new_surface(width + 1, self.visible * pitch, background)
+        self._rendered = [()] * self.visible  # (texto, seleccionada) de cada hueco
+        self._changed = set()  # huecos que difieren de lo que hay en pantalla
+        self._moved = True  # la superficie entera difiere de la pantalla
+        self._arrows = None  # (▲, ▼) en pantalla
+        self._buffer = (ctypes.c_char * len(self.surface.buffer)).from_buffer(self.surface.buffer)
+
+    def __len__(self):
+        return len(self.items)
+
+    def set_items(self, items):
+        """Cambia los textos; solo se vuelven a pintar las filas visibles que cambian"""
+        self.items = list(items)
+        self.select(self.selected)
+
+    def move(self, delta, wrap=False):
+        if not self.items:
+            return
+        index = self.selected + delta
+        if wrap:
+            index %= len(self.items)
+        self.select(index)
+
+    def select(self, index):
+        """Selecciona index desplazando lo justo para que sea visible"""
+        count = len(self.items)
+        self.selected = max(0, min(index, count - 1)) if count else 0
+        offset = min(self.offset, max(0, count - self.visible))
+        if self.selected < offset:
+            offset = self.selected
+        elif self.selected >= offset + self.visible:
+            offset = self.selected - self.visible + 1
+        if offset != self.offset:
+            self._scroll(offset - self.offset)
+            self.offset = offset
+        self._render()
+
+    def _scroll(self, delta):
+        """Desplaza el contenido de la superficie delta filas (un memmove)"""
+        self._moved = True
+        if abs(delta) >= self.visible:
+            self._rendered = [()] * self.visible
+            return
+        slot_bytes = self.pitch * self.surface.size[0] * gr.bytes_per_pixel
+        size = (self.visible - abs(delta)) * slot_bytes
+        base = ctypes.addressof(self._buffer)
+        if delta > 0:
+            ctypes.memmove(base, base + delta * slot_bytes, size)
+            self._rendered = self._rendered[delta:] + [()] * delta
+        else:
+            ctypes.memmove(base - delta * slot_bytes, base, size)
+            self._rendered = [()] * -delta + self._rendered[:delta]
+
+    def _render(self):
+        for slot in range(self.visible):
+            index = self.offset + slot
+            if index < len(self.items):
+                wanted = (self.items[index], index == self.selected)
+            else:
+                wanted = None
+            if self._rendered[slot] != wanted:
+                self._render_slot(slot, wanted)
+                self._rendered[slot] = wanted
+                self._changed.add(slot)
+
+    def _render_slot(self, slot, row):
+        top = slot * self.pitch
+        surface = self.surface
+        surface.paste(gr.native_color(self.background), (0, top, surface.size[0], top + self.pitch))
+        if row is None:
+            return
+        text, selected = row
+        fill = gr.colorBlue if selected else gr.colorGrayL1
+        sprite = _sprite("rounded_rectangle", (self.width + 1, self.row_height + 1), 5, fill, None)
+        surface.paste(sprite, (0, top), sprite)
+        mask, x0, y0 = gr.text_mask(text)
+        x = 5 + x0
+        y = top + 5 + y0
+        surface.paste(gr.native_color("white"), (x, y, x + mask.size[0], y + mask.size[1]), mask)
+
+    def _arrow_positions(self):
+        center = self.x + self.width // 2
+        return (center, self.y - 10), (center, self.y + self.visible * self.pitch)
+
+    def _draw_arrows(self, erase):
+        """Dibuja los indicadores de scroll; devuelve cuáles cambiaron"""
+        arrows = (self.offset > 0, self.offset + self.visible < len(self.items))
+        changed = tuple(shown != before for shown, before in zip(arrows, self._arrows or (None, None)))
+        for shown, redraw, text, position in zip(arrows, changed, "▲▼", self._arrow_positions()):
+            if erase and not redraw:
+                continue
+            if erase:
+                mask, x0, y0 = gr.text_mask(text, anchor="mm")
+                x = position[0] + x0
+                y = position[1] + y0
+                gr.draw_rectangle([x, y, x + mask.size[0] - 1, y + mask.size[1] - 1], fill=self.background)
+            if shown:
+                gr.draw_text(position, text, anchor="mm")
+        self._arrows = arrows
+        return changed
+
+    def _rows(self, first, last):
+        """Filas de la superficie de los huecos [first, last], sin el hueco final"""
+        return first * self.pitch, last * self.pitch + self.row_height + 1
+
+    def draw(self):
+        """Dibuja la lista completa en un frame que se ha redibujado entero"""
+        # Las filas van encima de los indicadores si llegan a tocarse
+        self._draw_arrows(erase=False)
+        gr.blit(self.surface, (self.x, self.y), self._rows(0, self.visible - 1))
+        self._changed.clear()
+        self._moved = False
+
+    def paint(self):
+        """Lleva a la pantalla solo lo que cambió (tras gr.draw_update())"""
+        up, down = self._draw_arrows(erase=True)
+        if up:
+            self._changed.add(0)
+        if down:
+            self._changed.add(self.visible - 1)
+        if self._moved:
+            gr.blit(self.surface, (self.x, self.y), self._rows(0, self.visible - 1))
+        else:
+            for slot in sorted(self._changed):
+                gr.blit(self.surface, (self.x, self.y), self._rows(slot, slot))
+        self._changed.clear()
+        self._moved = False
@@ -7,6 +7,10 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
+# Measure startup before importing anything heavy
+import lib.startup as startup
+startup.install()
+
 # Import our app module
 try:
     import app
@@ -1,16 +1,20 @@
 #!/bin/bash
+# Con tee, el estado de salida debe ser el del comando y no el de tee
+set -o pipefail
+
+appdir=$(dirname -- "$0")
 
 # Log file setup
 log_file="${appdir}/../log.txt"
 
 # Clean package cache
-apt-get clean >> "$log_file" 2>&1
+apt-get clean 2>&1 | tee -a "$log_file"
 
 # Remove unused packages and dependencies
-apt-get autoremove -y >> "$log_file" 2>&1
+apt-get autoremove -y 2>&1 | tee -a "$log_file"
 
 # Remove old config files
-apt-get purge -y $(dpkg -l | awk '/^rc/ {print $2}') >> "$log_file" 2>&1
+apt-get purge -y $(dpkg -l | awk '/^rc/ {print $2}') 2>&1 | tee -a "$log_file"
 
 # Clean up any remaining dependencies
-apt-get autoclean >> "$log_file" 2>&1
\ No newline at end of file
+apt-get autoclean 2>&1 | tee -a "$log_file"
\ No newline at end of file
@@ -1,26 +1,15 @@
 #!/bin/bash
+# Con tee, el estado de salida debe ser el del comando y no el de tee
+set -o pipefail
 
 appdir=$(dirname -- "$0")
 log_file="${appdir}/../log.txt"
 
-# Configurar SSH sin soporte SCP
-cat > /etc/ssh/sshd_config << EOF
-Port 22
-PermitRootLogin yes
-StrictModes no
-PasswordAuthentication yes
-ChallengeResponseAuthentication no
-UsePAM yes
-PrintMotd no
-UseDNS no
-AcceptEnv LANG LC_*
-Subsystem sftp /usr/lib/openssh/sftp-server
-AllowTcpForwarding no
-X11Forwarding no
-EOF
+# Configurar SSH sin soporte SCP (solo cambia las directivas necesarias)
+python3 "${appdir}/../lib/sshd_config.py" disable-scp 2>&1 | tee -a "$log_file"
 
 # Reiniciar SSH para aplicar cambios
-systemctl restart ssh &>>"$log_file"
+systemctl restart ssh 2>&1 | tee -a "$log_file"
 
-echo "SCP disabled successfully" >> "$log_file"
+echo "SCP disabled successfully" | tee -a "$log_file"
 exit 0
\ No newline at end of file
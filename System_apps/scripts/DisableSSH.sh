@@ -1,16 +1,13 @@
 #!/bin/bash
+# Con tee, el estado de salida debe ser el del comando y no el de tee
+set -o pipefail
 
 appdir=$(dirname -- "$0")
 log_file="${appdir}/../logs/ssh-manager.log"
 
-# Restore original config if exists
-if [ -f "/etc/ssh/sshd_config.backup" ]; then
-  mv -f /etc/ssh/sshd_config.backup /etc/ssh/sshd_config
-fi
-
 # Disable and stop SSH
-systemctl disable ssh &>>"$log_file"
-systemctl stop ssh &>>"$log_file"
+systemctl disable ssh 2>&1 | tee -a "$log_file"
+systemctl stop ssh 2>&1 | tee -a "$log_file"
 
-echo "SSH disabled successfully" >> "$log_file"
+echo "SSH disabled successfully" | tee -a "$log_file"
 exit 0
\ No newline at end of file
@@ -1,40 +1,24 @@
 #!/bin/bash
+# Con tee, el estado de salida debe ser el del comando y no el de tee
+set -o pipefail
 
 appdir=$(dirname -- "$0")
 log_file="${appdir}/../log.txt"
 
-# Backup configuración actual si existe
-if [ -f /etc/ssh/sshd_config ]; then
-  cp -f /etc/ssh/sshd_config /etc/ssh/sshd_config.backup
-fi
-
-# Configurar SSH con soporte SCP
-cat > /etc/ssh/sshd_config << EOF
-Port 22
-PermitRootLogin yes
-StrictModes no
-PasswordAuthentication yes
-ChallengeResponseAuthentication no
-UsePAM yes
-PrintMotd no
-UseDNS no
-AcceptEnv LANG LC_*
-Subsystem sftp /usr/lib/openssh/sftp-server
-AllowTcpForwarding yes
-X11Forwarding no
-EOF
+# Configurar SSH con soporte SCP (solo cambia las directivas necesarias)
+python3 "${appdir}/../lib/sshd_config.py" enable-scp 2>&1 | tee -a "$log_file"
 
 # Si SSH no está activo, lo iniciamos
 if ! systemctl is-active ssh >/dev/null; then
-    systemctl enable ssh &>>"$log_file"
-    systemctl start ssh &>>"$log_file"
+    systemctl enable ssh 2>&1 | tee -a "$log_file"
+    systemctl start ssh 2>&1 | tee -a "$log_file"
 fi
 
 # Set root password if not set
 echo "root:root" | chpasswd
 
 # Reiniciar SSH para aplicar cambios
-systemctl restart ssh &>>"$log_file"
+systemctl restart ssh 2>&1 | tee -a "$log_file"
 
-echo "SCP enabled successfully" >> "$log_file"
+echo "SCP enabled successfully" | tee -a "$log_file"
 exit 0
\ No newline at end of file
@@ -1,46 +1,33 @@
 #!/bin/bash
+# Con tee, el estado de salida debe ser el del comando y no el de tee
+set -o pipefail
 
 appdir=$(dirname -- "$0")
 log_file="${appdir}/../logs/ssh-manager.log"
 
 # Install OpenSSH server if it doesn't exist
-if ! systemctl list-units --full --all | grep -Fqi "ssh.service"; then
-  echo 'Installing OpenSSH server...' >> "$log_file"
+# Sin -q: grep lee toda la lista y systemctl no muere por SIGPIPE (pipefail)
+if ! systemctl list-units --full --all | grep -Fi "ssh.service" >/dev/null; then
+  echo 'Installing OpenSSH server...' | tee -a "$log_file"
   echo 'debconf debconf/frontend select Noninteractive' | debconf-set-selections
   DEBIAN_FRONTEND="noninteractive" apt-get update -y --fix-missing \
-    &>>"$log_file"
+    2>&1 | tee -a "$log_file"
   DEBIAN_FRONTEND="noninteractive" apt-get install -y openssh-server \
-    &>>"$log_file"
+    2>&1 | tee -a "$log_file"
 fi
 
-# Backup and configure sshd
-if [ -f /etc/ssh/sshd_config ]; then
-  cp -f /etc/ssh/sshd_config /etc/ssh/sshd_config.backup
-fi
-
-# Create minimal SSH config for SSH access
-cat > /etc/ssh/sshd_config << EOF
-Port 22
-PermitRootLogin yes
-StrictModes no
-PasswordAuthentication yes
-ChallengeResponseAuthentication no
-UsePAM yes
-PrintMotd no
-UseDNS no
-AcceptEnv LANG LC_*
-Subsystem sftp /usr/lib/openssh/sftp-server
-EOF
+# Set the sshd_config directives needed for SSH access, keeping the rest
+python3 "${appdir}/../lib/sshd_config.py" enable-ssh 2>&1 | tee -a "$log_file"
 
 # Enable and start SSH
-systemctl enable ssh &>>"$log_file"
-systemctl start ssh &>>"$log_file"
+systemctl enable ssh 2>&1 | tee -a "$log_file"
+systemctl start ssh 2>&1 | tee -a "$log_file"
 
 # Set root password if not set
 echo "root:root" | chpasswd
 
 # Restart SSH to apply changes
-systemctl restart ssh &>>"$log_file"
+systemctl restart ssh 2>&1 | tee -a "$log_file"
 
-echo "SSH enabled successfully" >> "$log_file"
+echo "SSH enabled successfully" | tee -a "$log_file"
 exit 0
\ No newline at end of file
@@ -1,10 +1,12 @@
 #!/bin/bash
+# Con tee, el estado de salida debe ser el del comando y no el de tee
+set -o pipefail
 
 appdir=$(dirname -- "$0")
 log_file="${appdir}/../log.txt"
 
 echo "Installing required packages..."
-apt-get update -y &>> "$log_file"
+apt-get update -y 2>&1 | tee -a "$log_file"
 apt-get install -y ntpdate curl tzdata
 
 DEFAULT_TIMEZONE="America/Chicago"
@@ -30,5 +32,5 @@ ntpdate -u ntp.ntsc.ac.cn
 
 hwclock --systohc
 
-echo "Time synchronized successfully" >> "$log_file"
+echo "Time synchronized successfully" | tee -a "$log_file"
 exit 0
\ No newline at end of file